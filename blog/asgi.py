@@ -0,0 +1,23 @@
+"""
+ASGI config for blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with BLOG_ASYNC_VIEWS = True so the read-only views run their
+queries concurrently, e.g. ``uvicorn blog.asgi:application --workers 4``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
+
+application = get_asgi_application()
+
+# flush buffered post views of idle workers and on shutdown
+from blog_engine.hits import counter  # noqa: E402
+
+counter.start()
@@ -40,11 +40,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog_engine.middleware.RequestMetricsMiddleware',
+    'blog_engine.middleware.PostViewCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog_engine.middleware.ReplicaRoutingMiddleware',
+    'blog_engine.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,6 +73,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'blog.wsgi.application'
+ASGI_APPLICATION = 'blog.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -83,9 +89,53 @@ DATABASES = {
         'TEST': {
             'NAME': 'CREATEDB',
         },
+        # keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': 60,
     }
 }
 
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# Every other alias is a read replica of default, used for the public read-only
+# views. Add one with TEST = {'MIRROR': 'default'} so tests share the primary.
+DATABASE_ROUTERS = ['blog_engine.routers.ReplicaRouter']
+BLOG_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# how long a client reads from the primary after one of its requests wrote to it
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias for anonymous full page responses. Point it at a file based or
+# Redis-compatible backend to share pages between workers.
+BLOG_PAGE_CACHE_ALIAS = 'default'
+BLOG_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Absolute URLs in feeds
+BLOG_SITE_URL = 'http://localhost:8000'
+
+# Async versions of the public read-only views, for deployments using blog.asgi
+BLOG_ASYNC_VIEWS = False
+
+# Per request Server-Timing headers and the /metrics/ endpoint, open to INTERNAL_IPS and staff
+BLOG_METRICS_ENABLED = True
+INTERNAL_IPS = ['127.0.0.1']
+# Server-Timing goes to staff users only, and to everyone with DEBUG or BLOG_SERVER_TIMING = True
+
+# Post views are buffered per process and written every N seconds. Popularity
+# counts a view half as much every BLOG_POPULARITY_HALF_LIFE seconds.
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 60
+BLOG_POPULARITY_HALF_LIFE = 60 * 60 * 24 * 7
+
+# Revisions are stored as diffs against the previous one, with a full copy every N
+BLOG_REVISION_SNAPSHOT_INTERVAL = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -124,3 +174,15 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static')
 ]
+
+# Files attached to posts
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_URL = '/media/'
+
+# Resized images are made with Pillow when it is installed, on their first
+# request, and cached under their content hashed names in the variant root.
+# Run render_markdown after changing the widths.
+BLOG_MEDIA_VARIANT_WIDTHS = [320, 640, 1280]
+BLOG_MEDIA_VARIANT_QUALITY = 82
+BLOG_MEDIA_VARIANT_ROOT = os.path.join(MEDIA_ROOT, 'variants')
+BLOG_MEDIA_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
 
 application = get_wsgi_application()
+
+# flush buffered post views of idle workers and on shutdown
+from blog_engine.hits import counter  # noqa: E402
+
+counter.start()
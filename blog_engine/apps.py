@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class BlogEngineConfig(AppConfig):
     name = 'blog_engine'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .metrics import install_query_wrapper
+
+        connection_created.connect(install_query_wrapper)
@@ -0,0 +1,414 @@
+import io
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .bulk import import_posts
+from .caching import invalidate_tag_cloud, purge_all_pages
+from .hits import flush_views
+from .media import Image, attach_media, file_name
+from .models import Media, Post, Revision, Tag
+from .pagination import CursorPaginator
+from .search import get_search_backend
+
+SYLLABLES = (
+    'ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vo', 'zi', 'pre', 'dun', 'gal', 'sor',
+    'ben', 'tic', 'mar', 'qui', 'fen', 'hol', 'yar', 'cet', 'dro', 'lim', 'nus', 'pe',
+)
+PAGE_SIZE = 4
+
+
+def make_vocabulary(rng, size=2000):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))))
+    return sorted(words)
+
+
+def _zipf_weights(size):
+    return [1.0 / rank for rank in range(1, size + 1)]
+
+
+def make_body(rng, vocabulary, weights):
+    """
+    A few paragraphs of Markdown with the usual headings, emphasis and lists
+    """
+    def sentence():
+        words = rng.choices(vocabulary, weights, k=rng.randint(6, 16))
+        words[0] = words[0].capitalize()
+        if rng.random() < 0.3:
+            index = rng.randrange(len(words))
+            words[index] = '*%s*' % words[index]
+        return ' '.join(words) + '.'
+
+    blocks = []
+    for _ in range(rng.randint(2, 6)):
+        if rng.random() < 0.2:
+            blocks.append('## ' + ' '.join(rng.choices(vocabulary, weights, k=3)).capitalize())
+        if rng.random() < 0.15:
+            blocks.append('\n'.join('- ' + sentence() for _ in range(rng.randint(2, 4))))
+        blocks.append(' '.join(sentence() for _ in range(rng.randint(2, 6))))
+    return '\n\n'.join(blocks)
+
+
+def iter_synthetic_records(posts, tags, tags_per_post, seed=0, days=365 * 5):
+    """
+    Yield import records for posts with Zipf distributed words and tags
+
+    The number of tags per post is drawn around tags_per_post, popular tags
+    end up on far more posts than the long tail, like on a real blog.
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    word_weights = _zipf_weights(len(vocabulary))
+    tag_titles = ['%s-%d' % (rng.choice(vocabulary), number) for number in range(tags)]
+    tag_weights = _zipf_weights(tags)
+    start = timezone.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(posts, 1)
+    for number in range(posts):
+        title = ' '.join(rng.choices(vocabulary, word_weights, k=rng.randint(2, 6))).capitalize()
+        fan_out = min(tags, max(0, int(rng.gauss(tags_per_post, tags_per_post / 2.0) + 0.5)))
+        post_tags = set()
+        while tag_titles and len(post_tags) < fan_out:
+            post_tags.add(rng.choices(tag_titles, tag_weights)[0])
+        yield {
+            'title': title,
+            'body': make_body(rng, vocabulary, word_weights),
+            'date_pub': (start + step * number).isoformat(),
+            'tags': sorted(post_tags),
+        }
+
+
+def seed_views(views_per_post=10, seed=0):
+    """
+    Flush Zipf distributed views over every post, a few posts get most of them
+    """
+    rng = random.Random(seed)
+    slugs = list(Post.objects.order_by('pk').values_list('slug', flat=True))
+    rng.shuffle(slugs)
+    return flush_views(Counter(rng.choices(slugs, _zipf_weights(len(slugs)), k=len(slugs) * views_per_post)))
+
+
+def seed_revisions():
+    """
+    Edit the newest published post once, its stored version becomes its first revision
+    """
+    post = Post.objects.published().order_by('-date_pub', '-pk').first()
+    if post is not None:
+        post.body += '\n\nEdited for the benchmark.'
+        post.save()
+
+
+def seed_data(posts, tags, tags_per_post, seed=0, batch_size=1000):
+    """
+    Insert synthetic posts and tags through the bulk import path, views for
+    the most read list, and an edited post with an attachment
+    """
+    created = import_posts(iter_synthetic_records(posts, tags, tags_per_post, seed), batch_size)
+    seed_views(seed=seed)
+    seed_revisions()
+    post = Post.objects.published().order_by('-date_pub', '-pk').first()
+    if post is not None:
+        seed_media(post)
+    return created
+
+
+def search_term(seed=0):
+    """
+    The most frequent word of the synthetic vocabulary, matches many posts
+    """
+    return make_vocabulary(random.Random(seed))[0]
+
+
+class Route:
+    def __init__(self, label, url_name, path, staff=False):
+        self.label = label
+        self.url_name = url_name
+        self.path = path
+        self.staff = staff
+
+
+def _deep_page(path, queryset, count, cursor, extra=''):
+    """
+    URL of the last page, by number or with a cursor pointing at it
+    """
+    last = max(1, math.ceil(count / PAGE_SIZE))
+    if not cursor:
+        return '%s?page=%d%s' % (path, last, extra)
+    obj = queryset.order_by('-date_pub', '-pk')[(last - 1) * PAGE_SIZE - 1] if last > 1 else None
+    if obj is None:
+        return path
+    return '%s?cursor=%s' % (path, CursorPaginator(queryset, PAGE_SIZE).encode_cursor(obj))
+
+
+def seed_media(post):
+    """
+    Attach a photo sized image to post, a text file when Pillow is not installed
+    """
+    if Image is None:
+        return attach_media(post, SimpleUploadedFile('notes.txt', b'benchmark notes\n' * 100))
+    image = Image.linear_gradient('L').resize((1600, 1000)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95)
+    return attach_media(post, SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg'))
+
+
+def get_routes(query=None):
+    """
+    One or more benchmark routes for every URL in blog_engine.urls
+    """
+    post = Post.objects.published().order_by('-date_pub', '-pk').first()
+    popular = list(Tag.objects.popular(2))
+    tag = popular[0] if popular else None
+    if post is None or tag is None:
+        raise ValueError('The benchmark needs at least one post and one tag')
+    query = query or search_term()
+    cursor = getattr(settings, 'BLOG_CURSOR_PAGINATION', False)
+    home = reverse('posts_list')
+    tag_path = reverse('tag_posts_list', kwargs={'slug': tag.slug})
+    posts = Post.objects.published()
+    post_count = posts.count()
+    search_count = get_search_backend().search(posts, query).count()
+    since = (post.updated_at - timedelta(days=30)).isoformat().replace('+', '%2B')
+    # the revision history and the attachment of a post seeded by seed_data, the benchmark itself never writes
+    revision = Revision.objects.select_related('post').order_by('-pk').first()
+    revision_routes = [] if revision is None else [
+        Route('post_history', 'post_history', reverse('post_history', kwargs={'slug': revision.post.slug}), staff=True),
+        Route('post_revision', 'post_revision', reverse('post_revision', kwargs={
+            'slug': revision.post.slug, 'number': revision.number,
+        }), staff=True),
+    ]
+    media = Media.objects.order_by('pk').first()
+    media_routes = [] if media is None else [Route('media_file', 'media_file', media.get_absolute_url())] + [
+        Route('media_variant_%d' % width, 'media_file', reverse('media_file', kwargs={
+            'name': file_name(media.content_hash, media.extension, width),
+        })) for width in media.get_variant_widths()[:1]
+    ]
+
+    return [
+        Route('posts_list', 'posts_list', home),
+        Route('posts_list_deep', 'posts_list', _deep_page(home, posts, post_count, cursor)),
+        Route('posts_list_search', 'posts_list', '%s?q=%s' % (home, query)),
+        Route('posts_list_search_deep', 'posts_list',
+              _deep_page(home, None, search_count, False, '&q=%s' % query)),
+        Route('tags_list', 'tags_list', reverse('tags_list')),
+        Route('browse', 'browse', '%s?%s' % (reverse('browse'), '&'.join('tag=%s' % other.slug for other in popular))),
+        Route('browse_search', 'browse', '%s?tag=%s&q=%s' % (reverse('browse'), tag.slug, query)),
+        Route('post_detail', 'post_detail', post.get_absolute_url()),
+        Route('popular_posts', 'popular_posts', reverse('popular_posts')),
+        Route('tag_posts_list', 'tag_posts_list', tag_path),
+        Route('tag_posts_list_deep', 'tag_posts_list',
+              _deep_page(tag_path, posts.filter(tags=tag), tag.post_count, cursor)),
+        Route('feed_atom', 'feed', reverse('feed', kwargs={'fmt': 'atom'})),
+        Route('feed_rss', 'feed', reverse('feed', kwargs={'fmt': 'rss'})),
+        Route('feed_json', 'feed', reverse('feed', kwargs={'fmt': 'json'})),
+        Route('feed_since', 'feed', '%s?since=%s' % (reverse('feed', kwargs={'fmt': 'atom'}), since)),
+        Route('tag_feed', 'tag_feed', reverse('tag_feed', kwargs={'slug': tag.slug, 'fmt': 'atom'})),
+        Route('sitemap', 'sitemap', reverse('sitemap')),
+        *media_routes,
+        Route('sitemap_section', 'sitemap_section',
+              reverse('sitemap_section', kwargs={'section': 'posts', 'start': 0})),
+        Route('metrics', 'metrics', reverse('metrics'), staff=True),
+        Route('post_create', 'post_create', reverse('post_create'), staff=True),
+        Route('post_update', 'post_update', reverse('post_update', kwargs={'slug': post.slug}), staff=True),
+        Route('post_delete', 'post_delete', reverse('post_delete', kwargs={'slug': post.slug}), staff=True),
+        *revision_routes,
+        Route('tag_create', 'tag_create', reverse('tag_create'), staff=True),
+        Route('tag_update', 'tag_update', reverse('tag_update', kwargs={'slug': tag.slug}), staff=True),
+        Route('tag_delete', 'tag_delete', reverse('tag_delete', kwargs={'slug': tag.slug}), staff=True),
+    ]
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a non-empty list
+    """
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100.0 * len(values)) - 1)]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _get_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _get_staff_user():
+    user = User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
+    if user is None:
+        user = User.objects.create_user('benchmark', is_staff=True)
+    return user
+
+
+def reset_caches(clear_caches=False):
+    """
+    Drop the blog's cached pages, feeds and tag cloud, or clear every configured cache
+
+    The caches may be shared with sessions and other applications, so they
+    are only cleared when asked to. Markdown is cached by content and only
+    read for bodies whose stored HTML is outdated, it is left alone.
+    """
+    if clear_caches:
+        for cache in caches.all():
+            cache.clear()
+        return
+    # cached pages and feeds are keyed by the page generation
+    purge_all_pages()
+    invalidate_tag_cloud()
+
+
+def measure(client, path, iterations, warmup=1, cold=True, clear_caches=False):
+    """
+    Time GET requests of one path, return (status, latencies in ms, queries per request)
+
+    Cold runs reset the caches before each request so the views do their
+    full work instead of being answered by the page cache.
+    """
+    status = None
+    latencies = []
+    queries = []
+    for iteration in range(warmup + iterations):
+        if cold:
+            reset_caches(clear_caches)
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            start = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        status = response.status_code
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(counter.count)
+    return status, latencies, queries
+
+
+def run_benchmark(routes, iterations=20, warmup=1, cold=True, clear_caches=False):
+    """
+    Benchmark routes and return a JSON serializable report
+    """
+    host = _get_host()
+    anonymous = Client(HTTP_HOST=host)
+    staff = Client(HTTP_HOST=host)
+    if any(route.staff for route in routes):
+        staff.force_login(_get_staff_user())
+
+    results = {}
+    for route in routes:
+        status, latencies, queries = measure(
+            staff if route.staff else anonymous, route.path, iterations, warmup, cold, clear_caches
+        )
+        results[route.label] = {
+            'url_name': route.url_name,
+            'path': route.path,
+            'status': status,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'queries': max(queries),
+        }
+    return {
+        'meta': {
+            'vendor': connection.vendor,
+            'django': django.get_version(),
+            'posts': Post.objects.count(),
+            'tags': Tag.objects.count(),
+            'iterations': iterations,
+            'cold': cold,
+            'created': timezone.now().isoformat(),
+        },
+        'routes': results,
+    }
+
+
+def compare(baseline, report, threshold=0.2):
+    """
+    Yield (label, baseline p95, p95, baseline queries, queries, regressed) for routes in both reports
+    """
+    for label, result in report['routes'].items():
+        previous = baseline['routes'].get(label)
+        if previous is None:
+            continue
+        regressed = (
+            result['p95_ms'] > previous['p95_ms'] * (1 + threshold) or
+            result['queries'] > previous['queries']
+        )
+        yield label, previous['p95_ms'], result['p95_ms'], previous['queries'], result['queries'], regressed
+
+
+def run_load(base_url, paths, concurrency=16, duration=10.0, timeout=30.0):
+    """
+    Sustained load against a running server, e.g. one started from blog.wsgi and one from blog.asgi
+
+    concurrency clients request the paths round robin for duration seconds.
+    Return a JSON serializable report with throughput and latency percentiles.
+    """
+    base_url = base_url.rstrip('/')
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def client(offset):
+        index = offset
+        while time.perf_counter() < deadline:
+            url = base_url + paths[index % len(paths)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError) as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'url': base_url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_s': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+    }
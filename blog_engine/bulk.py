@@ -0,0 +1,210 @@
+import json
+import os
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+
+from .caching import invalidate_tag_cloud, purge_all_pages, schedule_next_publish
+from .feeds import update_feed_items
+from .models import Post, Tag
+from .related import refresh_related_posts
+from .search import get_search_backend
+from .slugs import ALLOCATION_ATTEMPTS, allocate_slugs, base_slug
+
+FRONT_MATTER_RE = re.compile(r'\A---\s*\n(.*?)\n---\s*(?:\n|\Z)', re.DOTALL)
+
+
+def parse_front_matter(text):
+    """
+    Split a Markdown document into a dict of `key: value` front matter and its body
+
+    Lists may be written as `[a, b]` or `a, b`.
+    """
+    match = FRONT_MATTER_RE.match(text)
+    if not match:
+        return {}, text
+    meta = {}
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        meta[key.strip()] = value.strip().strip('"\'')
+    if 'tags' in meta:
+        meta['tags'] = [tag.strip().strip('"\'') for tag in meta['tags'].strip('[]').split(',') if tag.strip()]
+    return meta, text[match.end():]
+
+
+def format_front_matter(record):
+    lines = ['---', 'title: %s' % record['title'], 'slug: %s' % record['slug']]
+    if record.get('status'):
+        lines.append('status: %s' % record['status'])
+    if record.get('date_pub'):
+        lines.append('date_pub: %s' % record['date_pub'])
+    lines.append('tags: [%s]' % ', '.join(record.get('tags', [])))
+    lines.append('---')
+    return '\n'.join(lines) + '\n' + record['body']
+
+
+def iter_jsonl(fp):
+    for number, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError('Line %d: %s' % (number, e))
+
+
+def iter_markdown_files(paths):
+    """
+    Yield one record per .md file, directories are walked recursively
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.md'):
+                        yield read_markdown_file(os.path.join(root, name))
+        else:
+            yield read_markdown_file(path)
+
+
+def read_markdown_file(path):
+    with open(path, encoding='utf-8') as fp:
+        meta, body = parse_front_matter(fp.read())
+    meta.setdefault('title', os.path.splitext(os.path.basename(path))[0])
+    meta['body'] = body
+    return meta
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _record_tags(record):
+    tags = record.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return {tag.strip() for tag in tags if tag.strip()}
+
+
+def _get_or_create_tags(titles):
+    """
+    Map tag titles to tag ids, creating the missing tags with one bulk insert
+    """
+    slugs = {title: base_slug(Tag, title) for title in titles}
+    existing = dict(Tag.objects.filter(slug__in=set(slugs.values())).values_list('slug', 'pk'))
+    missing = {}
+    for title, slug in slugs.items():
+        if slug not in existing:
+            missing.setdefault(slug, title)
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(title=title[:50], slug=slug) for slug, title in missing.items()], ignore_conflicts=True
+        )
+        existing.update(Tag.objects.filter(slug__in=list(missing)).values_list('slug', 'pk'))
+    return {title: existing[slug] for title, slug in slugs.items()}
+
+
+def import_batch(records):
+    """
+    Insert one batch of post records with a constant number of queries
+    """
+    records = [record for record in records if record.get('title')]
+    if not records:
+        return 0
+    with transaction.atomic():
+        for record in records:
+            record['tags'] = _record_tags(record)
+        tag_ids = _get_or_create_tags({title for record in records for title in record['tags']})
+        slugs = allocate_slugs(Post, [record.get('slug') or record['title'] for record in records])
+        posts = []
+        for record, slug in zip(records, slugs):
+            post = Post(title=record['title'][:150], slug=slug, body=record.get('body', ''))
+            if record.get('status') in (Post.DRAFT, Post.PUBLISHED):
+                post.status = record['status']
+            if record.get('date_pub'):
+                date_pub = parse_datetime(str(record['date_pub']))
+                if date_pub is not None:
+                    post.date_pub = date_pub
+            post.render_body()
+            posts.append(post)
+        Post.objects.bulk_create(posts)
+        if any(post.pk is None for post in posts):
+            ids = dict(Post.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+            for post in posts:
+                post.pk = ids[post.slug]
+
+        Post.tags.through.objects.bulk_create([
+            Post.tags.through(post_id=post.pk, tag_id=tag_ids[title])
+            for record, post in zip(records, posts)
+            for title in record['tags']
+        ], ignore_conflicts=True)
+        Tag.objects.filter(pk__in=set(tag_ids.values())).update_post_counts()
+        get_search_backend().update_many(posts)
+        update_feed_items(posts)
+        refresh_related_posts([post.pk for post in posts])
+    return len(posts)
+
+
+def import_posts(records, batch_size=1000):
+    """
+    Stream records into the database batch by batch, return the number of posts created
+    """
+    created = 0
+    for batch in _batched(records, batch_size):
+        for attempt in range(ALLOCATION_ATTEMPTS):
+            try:
+                created += import_batch(batch)
+                break
+            except IntegrityError:
+                # a concurrent writer took one of the allocated slugs
+                if attempt == ALLOCATION_ATTEMPTS - 1:
+                    raise
+    invalidate_tag_cloud()
+    purge_all_pages()
+    schedule_next_publish()
+    return created
+
+
+def export_posts(batch_size=1000):
+    """
+    Yield post records in id order using keyset batches, never holding the whole table
+    """
+    last_pk = 0
+    while True:
+        rows = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').values(
+            'pk', 'title', 'slug', 'body', 'status', 'date_pub'
+        )[:batch_size])
+        if not rows:
+            return
+        tags = {}
+        for post_id, title in Post.tags.through.objects.filter(
+            post_id__in=[row['pk'] for row in rows]
+        ).order_by('tag__title').values_list('post_id', 'tag__title'):
+            tags.setdefault(post_id, []).append(title)
+        for row in rows:
+            yield {
+                'title': row['title'],
+                'slug': row['slug'],
+                'body': row['body'],
+                'status': row['status'],
+                'date_pub': row['date_pub'].isoformat(),
+                'tags': tags.get(row['pk'], []),
+            }
+        last_pk = rows[-1]['pk']
+
+
+def dump_jsonl(record):
+    return json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
@@ -0,0 +1,182 @@
+import hashlib
+import math
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import mark_safe
+
+TAG_CLOUD_CACHE_KEY = 'blog_engine:tag_cloud'
+TAG_CLOUD_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_GENERATION_KEY = 'blog_engine:page:generation'
+# timestamp of the next scheduled post going live, 0 when none is scheduled
+NEXT_PUBLISH_KEY = 'blog_engine:next_publish'
+
+
+TAG_CLOUD_WEIGHTS = 5
+
+
+def get_tag_cloud_weights(tags):
+    """
+    Attach a 1..TAG_CLOUD_WEIGHTS weight to each tag on a log scale of post_count
+    """
+    tags = list(tags)
+    counts = [tag.post_count for tag in tags]
+    low, high = math.log1p(min(counts, default=0)), math.log1p(max(counts, default=0))
+    for tag in tags:
+        if high == low:
+            tag.weight = 1
+        else:
+            tag.weight = 1 + int(round((math.log1p(tag.post_count) - low) / (high - low) * (TAG_CLOUD_WEIGHTS - 1)))
+        tag.font_size = 80 + (tag.weight - 1) * 15
+    return tags
+
+
+def get_tag_cloud():
+    """
+    Rendered aside tag cloud of the most used tags, built once per tag change
+    """
+    html = cache.get(TAG_CLOUD_CACHE_KEY)
+    if html is None:
+        from .models import Tag
+
+        size = getattr(settings, 'BLOG_TAG_CLOUD_SIZE', 50)
+        tags = sorted(get_tag_cloud_weights(Tag.objects.popular(size)), key=lambda tag: tag.title.lower())
+        html = render_to_string('blog_engine/include/tag_cloud.html', {'tags': tags})
+        cache.set(TAG_CLOUD_CACHE_KEY, html, cap_timeout(TAG_CLOUD_CACHE_TIMEOUT))
+    return mark_safe(html)
+
+
+def invalidate_tag_cloud():
+    cache.delete(TAG_CLOUD_CACHE_KEY)
+
+
+def get_page_cache():
+    return caches[getattr(settings, 'BLOG_PAGE_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+
+
+def _path_version_key(path):
+    return 'blog_engine:page:path:%s' % hashlib.md5(path.encode('utf-8')).hexdigest()
+
+
+def schedule_next_publish():
+    """
+    Store when the next scheduled post goes live, call after posts changed
+    """
+    from .models import Post
+
+    next_publish = Post.objects.scheduled().aggregate(next_publish=Min('date_pub'))['next_publish']
+    timestamp = next_publish.timestamp() if next_publish is not None else 0
+    get_page_cache().set(NEXT_PUBLISH_KEY, timestamp, None)
+    return timestamp
+
+
+def publish_scheduled(since=None):
+    """
+    Drop the pages, feeds and tag cloud rendered before a scheduled post went live
+
+    The tags of the posts that went live after since, a timestamp, are recounted.
+    """
+    from .models import Post, Tag
+
+    if since is not None:
+        went_live = Post.tags.through.objects.filter(
+            post__status=Post.PUBLISHED,
+            post__date_pub__gte=datetime.fromtimestamp(since, timezone.utc),
+            post__date_pub__lte=timezone.now(),
+        )
+        Tag.objects.filter(pk__in=went_live.values('tag_id')).update_post_counts()
+    invalidate_tag_cloud()
+    purge_all_pages()
+    schedule_next_publish()
+
+
+def cap_timeout(timeout):
+    """
+    Shorten a cache timeout so the entry expires when the next scheduled post goes live
+    """
+    next_publish = get_page_cache().get(NEXT_PUBLISH_KEY)
+    if next_publish:
+        timeout = min(timeout, max(math.ceil(next_publish - timezone.now().timestamp()), 1))
+    return timeout
+
+
+def _get_versions(*keys):
+    """
+    Read the page generation and other version keys with one cache lookup
+
+    The next publish time is read along with them, the first lookup after a
+    scheduled post went live purges everything and reads the new versions.
+    """
+    page_cache = get_page_cache()
+    versions = page_cache.get_many([NEXT_PUBLISH_KEY, PAGE_GENERATION_KEY] + list(keys))
+    next_publish = versions.get(NEXT_PUBLISH_KEY)
+    if next_publish is None:
+        next_publish = schedule_next_publish()
+    if next_publish and next_publish <= timezone.now().timestamp():
+        publish_scheduled(next_publish)
+        versions = page_cache.get_many([PAGE_GENERATION_KEY] + list(keys))
+    if not versions.get(PAGE_GENERATION_KEY):
+        versions[PAGE_GENERATION_KEY] = page_cache.get_or_set(PAGE_GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+    return versions
+
+
+def get_page_generation():
+    """
+    Token that changes whenever every page has to be purged
+    """
+    return _get_versions()[PAGE_GENERATION_KEY]
+
+
+def get_page_version(path):
+    """
+    Token that changes whenever the page at path is purged
+    """
+    versions = _get_versions(_path_version_key(path))
+    return '%s:%s' % (versions[PAGE_GENERATION_KEY], versions.get(_path_version_key(path), '0'))
+
+
+def get_page_cache_key(request):
+    """
+    Key for a cached page, built from the global and per path versions so a
+    purge only has to replace the version token
+    """
+    path = request.path
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode('utf-8')).hexdigest()
+    return 'blog_engine:page:%s:%s:%s:%s' % (
+        request.method,
+        get_page_version(path),
+        hashlib.md5(path.encode('utf-8')).hexdigest(),
+        query,
+    )
+
+
+def purge_paths(paths):
+    """
+    Drop cached pages for the given paths, including every query string variant
+    """
+    get_page_cache().set_many({_path_version_key(path): uuid.uuid4().hex for path in paths}, None)
+
+
+def purge_all_pages():
+    get_page_cache().set(PAGE_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def purge_post_pages(post):
+    """
+    Drop the pages a post is rendered on: its detail page, the post lists and its tag pages
+    """
+    from .models import Tag
+
+    paths = [post.get_absolute_url(), reverse('posts_list'), reverse('browse'), reverse('popular_posts')]
+    paths.extend(
+        reverse('tag_posts_list', kwargs={'slug': slug})
+        for slug in Tag.objects.filter(posts=post).values_list('slug', flat=True)
+    )
+    purge_paths(paths)
@@ -0,0 +1,34 @@
+from django.db.models import Count, F
+
+FACET_LIMIT = 20
+
+
+def filter_by_tags(queryset, tag_ids):
+    """
+    Posts tagged with every one of tag_ids
+
+    The posting lists of the tags are intersected with one GROUP BY/HAVING
+    over the through table instead of a join per tag.
+    """
+    from .models import Post
+
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return queryset
+    matching = Post.tags.through.objects.filter(tag_id__in=tag_ids).values('post_id').annotate(
+        matched=Count('tag_id')
+    ).filter(matched=len(tag_ids)).values('post_id')
+    return queryset.filter(pk__in=matching)
+
+
+def get_facets(queryset, exclude_tag_ids=(), limit=FACET_LIMIT):
+    """
+    Return [{'slug', 'title', 'count'}] of the tags most used by the posts in queryset
+    """
+    from .models import Post
+
+    return list(Post.tags.through.objects.filter(
+        post_id__in=queryset.order_by().values('pk')
+    ).exclude(tag_id__in=exclude_tag_ids).values(
+        slug=F('tag__slug'), title=F('tag__title')
+    ).annotate(count=Count('post_id')).order_by('-count', 'title')[:limit])
@@ -0,0 +1,205 @@
+import hashlib
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import feedgenerator, timezone
+from django.utils.xmlutils import SimplerXMLGenerator
+
+FEED_FORMATS = ('atom', 'rss', 'json')
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+
+def get_site_url():
+    return getattr(settings, 'BLOG_SITE_URL', 'http://localhost:8000').rstrip('/')
+
+
+def get_feed_size():
+    return getattr(settings, 'BLOG_FEED_SIZE', 20)
+
+
+class PrecomputedFeedMixin:
+    """
+    Write item fragments rendered ahead of time instead of building items per request
+    """
+    def __init__(self, *args, fragments=(), updated=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments = fragments
+        self.updated = updated
+
+    def write_items(self, handler):
+        for fragment in self.fragments:
+            # ignorableWhitespace writes the already escaped markup as is
+            handler.ignorableWhitespace(fragment)
+
+    def latest_post_date(self):
+        return self.updated or super().latest_post_date()
+
+
+class PrecomputedAtomFeed(PrecomputedFeedMixin, feedgenerator.Atom1Feed):
+    pass
+
+
+class PrecomputedRssFeed(PrecomputedFeedMixin, feedgenerator.Rss201rev2Feed):
+    pass
+
+
+FEED_CLASSES = {
+    'atom': (PrecomputedAtomFeed, 'entry'),
+    'rss': (PrecomputedRssFeed, 'item'),
+}
+
+
+def _render_xml_item(fmt, item):
+    feed_class, element = FEED_CLASSES[fmt]
+    feed = feed_class(title='', link='', description='')
+    stream = StringIO()
+    handler = SimplerXMLGenerator(stream, 'utf-8')
+    handler.startElement(element, feed.item_attributes(item))
+    feed.add_item_elements(handler, item)
+    handler.endElement(element)
+    return stream.getvalue()
+
+
+def render_feed_item(post, tag_titles):
+    """
+    Return the FeedItem field values for a post, built from its stored HTML
+    """
+    from .models import FeedItem
+
+    link = get_site_url() + post.get_absolute_url()
+    feed = feedgenerator.Atom1Feed(title='', link='', description='')
+    feed.add_item(
+        title=post.title, link=link, description=post.body_html, unique_id=link,
+        pubdate=post.date_pub, updateddate=post.updated_at, categories=tag_titles,
+    )
+    item = feed.items[0]
+    return FeedItem(
+        post_id=post.pk,
+        date_pub=post.date_pub,
+        updated_at=post.updated_at,
+        atom=_render_xml_item('atom', item),
+        rss=_render_xml_item('rss', item),
+        json=json.dumps({
+            'id': link,
+            'url': link,
+            'title': post.title,
+            'content_html': post.body_html,
+            'date_published': post.date_pub.isoformat(),
+            'date_modified': post.updated_at.isoformat(),
+            'tags': tag_titles,
+        }),
+    )
+
+
+def update_feed_items(posts):
+    """
+    Re-render the stored feed items of the given posts with two queries
+
+    Drafts lose their item, scheduled posts keep one that build_feed skips
+    until their publish time.
+    """
+    from .models import FeedItem, Post
+
+    posts = [post for post in posts if post.pk is not None]
+    if not posts:
+        return
+    tags = {}
+    for post_id, title in Post.tags.through.objects.filter(
+        post_id__in=[post.pk for post in posts]
+    ).order_by('tag__title').values_list('post_id', 'tag__title'):
+        tags.setdefault(post_id, []).append(title)
+    items = [render_feed_item(post, tags.get(post.pk, [])) for post in posts if post.status == Post.PUBLISHED]
+    FeedItem.objects.filter(post_id__in=[post.pk for post in posts]).delete()
+    FeedItem.objects.bulk_create(items)
+
+
+def rebuild_feed_items(queryset, batch_size=500):
+    batch = []
+    for post in queryset.iterator(chunk_size=batch_size):
+        batch.append(post)
+        if len(batch) >= batch_size:
+            update_feed_items(batch)
+            batch = []
+    update_feed_items(batch)
+
+
+def _feed_cache_key(fmt, tag_slug=None):
+    from .caching import get_page_generation
+
+    return 'blog_engine:feed:%s:%s:%s' % (get_page_generation(), fmt, tag_slug or '')
+
+
+def purge_feeds(tag_slugs=()):
+    """
+    Drop the cached global feeds and the feeds of the given tags
+    """
+    keys = [_feed_cache_key(fmt) for fmt in FEED_FORMATS]
+    keys.extend(_feed_cache_key(fmt, slug) for slug in tag_slugs for fmt in FEED_FORMATS)
+    cache.delete_many(keys)
+
+
+def build_feed(fmt, tag=None, since=None):
+    """
+    Assemble a feed document from stored items, return (etag, bytes)
+    """
+    from .models import FeedItem
+
+    items = FeedItem.objects.filter(date_pub__lte=timezone.now()).order_by('-date_pub', '-post_id')
+    if tag is not None:
+        items = items.filter(post__tags=tag)
+    if since is not None:
+        # scheduled posts are new to the reader when they go live, not when they were written
+        items = items.filter(Q(updated_at__gt=since) | Q(date_pub__gt=since))
+    items = list(items.values_list('updated_at', fmt)[:get_feed_size()])
+    updated = max((updated_at for updated_at, _ in items), default=None)
+    fragments = [fragment for _, fragment in items]
+
+    title = getattr(settings, 'BLOG_FEED_TITLE', 'Blog')
+    if tag is not None:
+        title = '%s: #%s' % (title, tag.title)
+        home = get_site_url() + tag.get_absolute_url()
+        feed_url = get_site_url() + reverse('tag_feed', kwargs={'slug': tag.slug, 'fmt': fmt})
+    else:
+        home = get_site_url() + reverse('posts_list')
+        feed_url = get_site_url() + reverse('feed', kwargs={'fmt': fmt})
+
+    if fmt == 'json':
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': title,
+            'home_page_url': home,
+            'feed_url': feed_url,
+        })
+        content = ('%s, "items": [%s]}' % (header[:-1], ', '.join(fragments))).encode('utf-8')
+    else:
+        feed_class = FEED_CLASSES[fmt][0]
+        feed = feed_class(
+            title=title, link=home, description=title, feed_url=feed_url,
+            fragments=fragments, updated=updated,
+        )
+        content = feed.writeString('utf-8').encode('utf-8')
+    return '"%s"' % hashlib.sha1(content).hexdigest(), content
+
+
+def get_feed(fmt, tag=None):
+    """
+    Cached feed document, rebuilt from stored items after posts in it change
+    """
+    from .caching import cap_timeout
+
+    key = _feed_cache_key(fmt, tag.slug if tag is not None else None)
+    feed = cache.get(key)
+    if feed is None:
+        feed = build_feed(fmt, tag)
+        cache.set(key, feed, cap_timeout(FEED_CACHE_TIMEOUT))
+    return feed
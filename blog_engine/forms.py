@@ -1,19 +1,87 @@
 from django import forms
 
+from .media import attach_media, validate_upload
 from .models import Post, Tag
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """
+    Any number of uploaded files, cleaned to a list
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if not isinstance(data, (list, tuple)):
+            data = [data] if data else []
+        return [super(MultipleFileField, self).clean(upload, initial) for upload in data]
+
+
 class PostCreateForm(forms.ModelForm):
+    attachments = MultipleFileField(
+        required=False,
+        label='Attach files',
+        help_text='Uploaded files are listed below with the Markdown that shows them in the body.',
+        widget=MultipleFileInput(attrs={'class': 'form-control-file'}),
+    )
+
     class Meta:
         model = Post
-        fields = ('title', 'body', 'tags')
+        fields = ('title', 'body', 'tags', 'status', 'date_pub')
+        labels = {
+            'date_pub': 'Publish at',
+        }
+        help_texts = {
+            'date_pub': 'A future time schedules a published post, empty keeps the current one.',
+        }
 
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'body': forms.Textarea(attrs={'class': 'form-control'}),
-            'tags': forms.SelectMultiple(attrs={'class': 'form-control'})
+            'tags': forms.SelectMultiple(attrs={'class': 'form-control'}),
+            'status': forms.Select(attrs={'class': 'form-control'}),
+            'date_pub': forms.DateTimeInput(
+                attrs={'class': 'form-control', 'type': 'datetime-local', 'step': 1}, format='%Y-%m-%dT%H:%M:%S'
+            ),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the instance defaults, published now, apply when they are left out
+        self.fields['status'].required = False
+        self.fields['date_pub'].required = False
+
+    def clean_status(self):
+        return self.cleaned_data['status'] or self.instance.status
+
+    def clean_date_pub(self):
+        date_pub = self.cleaned_data['date_pub']
+        if date_pub is None:
+            return self.instance.date_pub
+        # the field shows whole seconds, an unchanged value keeps the stored microseconds
+        # so the post stays in place in the lists and their cursors
+        if self.instance.date_pub and date_pub == self.instance.date_pub.replace(microsecond=0):
+            return self.instance.date_pub
+        return date_pub
+
+    def clean_attachments(self):
+        uploads = self.cleaned_data['attachments']
+        for upload in uploads:
+            validate_upload(upload)
+        return uploads
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit:
+            for upload in self.cleaned_data.get('attachments') or []:
+                attach_media(post, upload)
+        return post
+
 
 class TagCreateForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,183 @@
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import purge_paths
+
+logger = logging.getLogger(__name__)
+
+# keeps IN lists under SQLite's variable limit
+CHUNK_SIZE = 500
+
+
+def get_flush_interval():
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 60)
+
+
+def get_half_life():
+    return getattr(settings, 'BLOG_POPULARITY_HALF_LIFE', 60 * 60 * 24 * 7)
+
+
+def add_views(popularity, views, now):
+    """
+    Add views seen at now to a popularity
+
+    Popularity is log2 of the sum of every view weighted by 2 ** (time / half
+    life). That is the decayed view count times a factor every post shares,
+    so posts rank by decayed views without rewriting every row as time passes.
+    """
+    added = now.timestamp() / get_half_life() + math.log2(views)
+    if popularity is None:
+        return added
+    high, low = max(popularity, added), min(popularity, added)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def get_decayed_views(popularity, now=None):
+    """
+    Views of a popularity, each view counting half as much every half life
+    """
+    if popularity is None:
+        return 0.0
+    now = now or timezone.now()
+    return 2 ** (popularity - now.timestamp() / get_half_life())
+
+
+def flush_views(counts, now=None):
+    """
+    Add {slug: views} to the stored view counts and popularity, return the number of posts updated
+
+    Every CHUNK_SIZE posts cost one lookup and one upsert: missing rows are
+    inserted, then the locked rows are updated with a single bulk update.
+    """
+    from .models import Post, PostStats
+
+    now = now or timezone.now()
+    slugs = list(counts)
+    updated = 0
+    for i in range(0, len(slugs), CHUNK_SIZE):
+        post_views = {
+            pk: counts[slug]
+            for slug, pk in Post.objects.filter(slug__in=slugs[i:i + CHUNK_SIZE]).values_list('slug', 'pk')
+        }
+        if not post_views:
+            continue
+        with transaction.atomic():
+            PostStats.objects.bulk_create([PostStats(post_id=pk) for pk in post_views], ignore_conflicts=True)
+            rows = list(PostStats.objects.select_for_update().filter(post_id__in=post_views))
+            for row in rows:
+                row.views += post_views[row.post_id]
+                row.popularity = add_views(row.popularity, post_views[row.post_id], now)
+            PostStats.objects.bulk_update(rows, ['views', 'popularity'])
+        updated += len(rows)
+    if updated:
+        purge_paths([reverse('popular_posts')])
+    return updated
+
+
+class ViewCounter:
+    """
+    Per process buffer of post views, flushed with flush_views
+
+    Views are counted by slug in memory and written by the first request
+    BLOG_VIEW_COUNT_FLUSH_INTERVAL seconds after the oldest buffered view, so
+    a busy post costs one row update per interval instead of one per view.
+    After start() a background thread also flushes every interval and the
+    buffer is flushed when the process exits, otherwise views buffered by an
+    idle worker wait for its next post view and are lost when it exits.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.started = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.registered = False
+
+    def add(self, slug):
+        """
+        Count a view, return True when the buffer is due to be flushed
+        """
+        with self.lock:
+            self.counts[slug] += 1
+            if self.started is None:
+                self.started = time.monotonic()
+            return time.monotonic() - self.started >= get_flush_interval()
+
+    def take(self):
+        """
+        Return the buffered counts and start a new buffer
+        """
+        with self.lock:
+            counts, self.counts, self.started = self.counts, Counter(), None
+        return counts
+
+    def flush(self):
+        counts = self.take()
+        if not counts:
+            return 0
+        try:
+            return flush_views(counts)
+        except Exception:
+            # keep the views for the next flush
+            with self.lock:
+                self.counts.update(counts)
+            raise
+
+    def start(self):
+        """
+        Flush from a background thread every interval and when the process exits
+
+        Called by the WSGI and ASGI entry points.
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self.run, name='blog-view-counter', daemon=True)
+            self.thread.start()
+        if not self.registered:
+            self.registered = True
+            atexit.register(self.stop)
+            # servers that preload the application fork their workers after this ran
+            os.register_at_fork(after_in_child=self.after_fork)
+
+    def run(self):
+        while not self.stopped.wait(get_flush_interval()):
+            self.flush_quietly()
+
+    def stop(self):
+        """
+        Stop the background thread and write what is still buffered
+        """
+        self.stopped.set()
+        self.flush_quietly()
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush buffered post views, retrying with the next flush')
+        finally:
+            # the flushing thread keeps no connection open between flushes
+            connections.close_all()
+
+    def after_fork(self):
+        # the parent's buffer is flushed by the parent, its lock may have been held by another thread
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.started = None
+        self.thread = None
+        self.start()
+
+
+counter = ViewCounter()
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import compare, get_routes, run_benchmark, search_term
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every blog route, report p50/p95 latency and query counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--warm', action='store_true', help='Keep caches between requests')
+        parser.add_argument(
+            '--clear-caches', action='store_true',
+            help='Clear every configured cache between cold requests, not only the blog keys',
+        )
+        parser.add_argument('--query', help='Search term, defaults to the most common synthetic word')
+        parser.add_argument('--seed', type=int, default=0, help='Seed the synthetic data was created with')
+        parser.add_argument('--route', action='append', dest='routes', help='Only run these routes')
+        parser.add_argument('--output', help='Write the report to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON report to diff against')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown, 0.2 is 20%%')
+
+    def handle(self, *args, **options):
+        try:
+            routes = get_routes(options['query'] or search_term(options['seed']))
+        except ValueError as e:
+            raise CommandError(e)
+        if options['routes']:
+            routes = [route for route in routes if route.label in options['routes']]
+
+        report = run_benchmark(
+            routes, options['iterations'], options['warmup'], cold=not options['warm'],
+            clear_caches=options['clear_caches'],
+        )
+        meta = report['meta']
+        self.stdout.write('%s, %d posts, %d tags, %d iterations, %s caches' % (
+            meta['vendor'], meta['posts'], meta['tags'], meta['iterations'], 'cold' if meta['cold'] else 'warm'
+        ))
+        self.stdout.write('%-24s %6s %10s %10s %8s' % ('route', 'status', 'p50 ms', 'p95 ms', 'queries'))
+        for label, result in report['routes'].items():
+            self.stdout.write('%-24s %6d %10.2f %10.2f %8d' % (
+                label, result['status'], result['p50_ms'], result['p95_ms'], result['queries']
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fp:
+                json.dump(report, fp, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS('Saved report to %s' % options['output']))
+
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as fp:
+                    baseline = json.load(fp)
+            except (OSError, ValueError) as e:
+                raise CommandError(e)
+            regressions = 0
+            for label, old_p95, new_p95, old_queries, new_queries, regressed in compare(
+                baseline, report, options['threshold']
+            ):
+                line = '%-24s p95 %10.2f -> %10.2f  queries %4d -> %4d' % (
+                    label, old_p95, new_p95, old_queries, new_queries
+                )
+                if regressed:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+            if regressions:
+                raise CommandError('%d routes regressed against %s' % (regressions, options['compare']))
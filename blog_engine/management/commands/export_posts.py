@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk import dump_jsonl, export_posts, format_front_matter
+
+
+class Command(BaseCommand):
+    help = 'Stream all posts to JSONL or to a directory of Markdown files with front matter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=('jsonl', 'markdown'), default='jsonl')
+        parser.add_argument('--output', help='JSONL file or Markdown directory, defaults to stdout for JSONL')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        records = export_posts(batch_size=options['batch_size'])
+        if options['format'] == 'markdown':
+            if not options['output']:
+                raise CommandError('--output directory is required for Markdown export')
+            os.makedirs(options['output'], exist_ok=True)
+            count = 0
+            for count, record in enumerate(records, 1):
+                path = os.path.join(options['output'], '%s.md' % record['slug'])
+                with open(path, 'w', encoding='utf-8') as fp:
+                    fp.write(format_front_matter(record))
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fp:
+                count = self.write_jsonl(records, fp)
+        else:
+            count = self.write_jsonl(records, self.stdout)
+        self.stderr.write('Exported %d posts' % count)
+
+    def write_jsonl(self, records, fp):
+        count = 0
+        for count, record in enumerate(records, 1):
+            fp.write(dump_jsonl(record) + '\n')
+        return count
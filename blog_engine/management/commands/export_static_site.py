@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...staticsite import export_site
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the post lists, post pages, tag pages and the tags list to static HTML for a CDN. '
+        'Later runs only rewrite the pages affected by posts changed since the previous one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Directory to write <path>/index.html files to')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to the CPU count')
+        parser.add_argument('--full', action='store_true', help='Render every page instead of only changed ones')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written, deleted = export_site(
+            options['output'], workers=options['workers'], full=options['full'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d pages and removed %d to %s' % (written, deleted, options['output'])
+        ))
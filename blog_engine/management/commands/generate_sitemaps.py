@@ -0,0 +1,41 @@
+import gzip
+import os
+
+from django.core.management.base import BaseCommand
+
+from ...sitemaps import iter_index, iter_section, iter_sitemap, iter_sitemap_files, needs_index
+
+FILE_NAME = 'sitemap-%s-%d.xml.gz'
+
+
+class Command(BaseCommand):
+    help = 'Write gzipped sitemap files to a directory for the web server to serve'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Directory for sitemap.xml.gz and its section files')
+        parser.add_argument(
+            '--path', default='/', help='Path the directory is served at, the index links the files under it'
+        )
+
+    def write(self, path, chunks):
+        with gzip.open(path, 'wt', encoding='utf-8') as fp:
+            for chunk in chunks:
+                fp.write(chunk)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        prefix = options['path'].rstrip('/') + '/'
+        os.makedirs(output, exist_ok=True)
+        if not needs_index():
+            self.write(os.path.join(output, 'sitemap.xml.gz'), iter_sitemap())
+            self.stdout.write(self.style.SUCCESS('Wrote 1 sitemap file to %s' % output))
+            return
+        files = list(iter_sitemap_files())
+        for section, start in files:
+            self.write(os.path.join(output, FILE_NAME % (section, start)), iter_section(section, start))
+        # the index points at the files written here instead of the sitemap views
+        self.write(
+            os.path.join(output, 'sitemap.xml.gz'),
+            iter_index(files, lambda section, start: prefix + FILE_NAME % (section, start)),
+        )
+        self.stdout.write(self.style.SUCCESS('Wrote %d sitemap files to %s' % (len(files) + 1, output)))
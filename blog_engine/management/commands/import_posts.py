@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk import import_posts, iter_jsonl, iter_markdown_files
+
+
+class Command(BaseCommand):
+    help = 'Bulk import posts from JSONL files or Markdown files with front matter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='JSONL files, Markdown files or directories, - for stdin')
+        parser.add_argument('--format', choices=('jsonl', 'markdown'), default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def iter_records(self, paths, fmt):
+        if fmt == 'markdown':
+            yield from iter_markdown_files(paths)
+            return
+        for path in paths:
+            if path == '-':
+                yield from iter_jsonl(sys.stdin)
+                continue
+            with open(path, encoding='utf-8') as fp:
+                yield from iter_jsonl(fp)
+
+    def handle(self, *args, **options):
+        try:
+            created = import_posts(
+                self.iter_records(options['paths'], options['format']),
+                batch_size=options['batch_size'],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS('Imported %d posts' % created))
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import get_routes, run_load, search_term
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure sustained concurrency of a running server on the public read-only routes. '
+        'Run it once against the WSGI and once against the ASGI deployment to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Base URL of the running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, action='append', help='Repeat for several levels')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per concurrency level')
+        parser.add_argument('--seed', type=int, default=0, help='Seed the synthetic data was created with')
+        parser.add_argument('--label', default='', help='Name of the deployment, e.g. wsgi or asgi')
+        parser.add_argument('--output', help='Write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            routes = get_routes(search_term(options['seed']))
+        except ValueError as e:
+            raise CommandError(e)
+        paths = [route.path for route in routes if not route.staff]
+
+        results = []
+        for concurrency in options['concurrency'] or [1, 8, 32]:
+            result = run_load(options['url'], paths, concurrency, options['duration'])
+            results.append(result)
+            self.stdout.write('%-8s concurrency %4d  %8.1f req/s  p50 %8s ms  p95 %8s ms  %d errors' % (
+                options['label'], concurrency, result['requests_per_s'],
+                result['p50_ms'], result['p95_ms'], result['errors'],
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fp:
+                json.dump({'label': options['label'], 'results': results}, fp, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS('Saved report to %s' % options['output']))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...caching import purge_all_pages
+from ...feeds import rebuild_feed_items
+from ...models import Post
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored feed items of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rebuild_feed_items(Post.objects.order_by('pk'), batch_size=options['batch_size'])
+        purge_all_pages()
+        self.stdout.write(self.style.SUCCESS('Rebuilt feed items'))
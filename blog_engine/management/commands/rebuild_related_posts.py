@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...caching import purge_all_pages
+from ...related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related posts of every post from shared tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_related_posts(batch_size=options['batch_size'])
+        purge_all_pages()
+        self.stdout.write(self.style.SUCCESS('Rebuilt related posts for %d posts' % count))
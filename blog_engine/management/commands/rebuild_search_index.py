@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Post
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all posts'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild(Post.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt search index with %s' % backend.__class__.__name__
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...caching import invalidate_tag_cloud, purge_all_pages
+from ...models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Recount Tag.post_count from the Post.tags through table'
+
+    def handle(self, *args, **options):
+        updated = Tag.objects.all().update_post_counts()
+        invalidate_tag_cloud()
+        # the tags list and every page with the aside show the counts
+        purge_all_pages()
+        self.stdout.write(self.style.SUCCESS('Reconciled post counts for %d tags' % updated))
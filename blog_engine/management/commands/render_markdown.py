@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Post
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored post HTML after the body or Markdown extension config changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Re-render every post')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.only('pk', 'body', 'body_hash').order_by('pk')
+        stale = []
+        updated = 0
+        for post in queryset.iterator(chunk_size=batch_size):
+            if options['force']:
+                post.body_hash = ''
+            if post.render_body():
+                stale.append(post)
+            if len(stale) >= batch_size:
+                Post.objects.bulk_update(stale, ['body_html', 'body_hash', 'body_text', 'excerpt'])
+                updated += len(stale)
+                stale = []
+        if stale:
+            Post.objects.bulk_update(stale, ['body_html', 'body_hash', 'body_text', 'excerpt'])
+            updated += len(stale)
+        self.stdout.write(self.style.SUCCESS('Re-rendered %d posts' % updated))
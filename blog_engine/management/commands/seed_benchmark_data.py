@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...benchmark import seed_data
+
+
+class Command(BaseCommand):
+    help = 'Insert synthetic posts and tags for benchmarking, never run this against production'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--tags-per-post', type=float, default=3, help='Average number of tags per post')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = seed_data(
+            options['posts'], options['tags'], options['tags_per_post'],
+            seed=options['seed'], batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS('Created %d posts' % created))
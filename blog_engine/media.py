@@ -0,0 +1,212 @@
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from django.urls import reverse
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # without Pillow files are still attached, images are served at their original size
+    Image = ImageOps = None
+
+# images Pillow can resize without losing anything, GIFs would lose their animation
+VARIANT_EXTENSIONS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+IMAGE_EXTENSIONS = set(VARIANT_EXTENSIONS) | {'.gif'}
+# <content hash>[-<width>w]<extension>, the file names media are served and cached under
+FILE_NAME_RE = re.compile(r'(?P<hash>[0-9a-f]{16})(?:-(?P<width>\d+)w)?(?P<extension>(?:\.[a-z0-9]+)?)')
+# EXIF orientations of images stored rotated by 90 degrees
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+# browsers and proxies may keep a content hashed file forever
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def get_variant_widths():
+    return sorted(getattr(settings, 'BLOG_MEDIA_VARIANT_WIDTHS', [320, 640, 1280]))
+
+
+def get_variant_quality():
+    return getattr(settings, 'BLOG_MEDIA_VARIANT_QUALITY', 82)
+
+
+def get_variant_root():
+    return getattr(settings, 'BLOG_MEDIA_VARIANT_ROOT', None) or os.path.join(settings.MEDIA_ROOT, 'variants')
+
+
+def get_image_sizes():
+    return getattr(settings, 'BLOG_MEDIA_IMAGE_SIZES', '(min-width: 1200px) 640px, 100vw')
+
+
+def get_max_upload_size():
+    return getattr(settings, 'BLOG_MEDIA_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+
+
+def get_extension(filename):
+    return os.path.splitext(filename)[1].lower()
+
+
+def file_name(content_hash, extension, width=None):
+    """
+    Content hashed name of a media file, or of one of its variants
+    """
+    if width is None:
+        return '%s%s' % (content_hash, extension)
+    return '%s-%dw%s' % (content_hash, width, extension)
+
+
+def read_image_size(fp):
+    """
+    (width, height) of an image file as it is displayed, None when it is not
+    an image Pillow can read or Pillow is not installed
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(fp) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        fp.seek(0)
+    return width, height
+
+
+def validate_upload(upload):
+    if upload.size > get_max_upload_size():
+        raise ValidationError('%s is larger than %s.' % (upload.name, filesizeformat(get_max_upload_size())))
+    if Image is not None and get_extension(upload.name) in IMAGE_EXTENSIONS and read_image_size(upload) is None:
+        raise ValidationError('%s is not a valid image.' % upload.name)
+
+
+def attach_media(post, upload):
+    """
+    Store an uploaded file as a Media of post, named after the hash of its content
+    """
+    from .models import Media
+
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    size = read_image_size(upload) if get_extension(upload.name) in IMAGE_EXTENSIONS else None
+    media = Media(
+        post=post,
+        name=os.path.basename(upload.name)[:255],
+        content_hash=digest.hexdigest()[:16],
+        extension=get_extension(upload.name)[:10],
+        # the type the browser sent is not trusted, files are served with it
+        content_type=mimetypes.guess_type(upload.name)[0] or 'application/octet-stream',
+        size=upload.size,
+    )
+    if size is not None:
+        media.width, media.height = size
+    media.file.save(file_name(media.content_hash, media.extension), upload, save=False)
+    media.save()
+    return media
+
+
+def variant_widths(width, extension):
+    """
+    Widths of the variants of an image, never wider than the image itself
+    """
+    if width is None or Image is None or extension not in VARIANT_EXTENSIONS:
+        return []
+    return sorted({min(variant, width) for variant in get_variant_widths()})
+
+
+def make_variant(media, width, path):
+    """
+    Write media resized to width and recompressed to path
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image_format = VARIANT_EXTENSIONS[media.extension]
+    with media.file.open('rb') as fp, Image.open(fp) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        options = {'optimize': True}
+        if image_format == 'JPEG':
+            image = image.convert('RGB') if image.mode not in ('RGB', 'L') else image
+            options.update(quality=get_variant_quality(), progressive=True)
+        elif image_format == 'WEBP':
+            options['quality'] = get_variant_quality()
+        # write then rename so a concurrent request never serves a half written variant
+        tmp = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+        try:
+            image.save(tmp, image_format, **options)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def get_variant_path(media, width):
+    """
+    Path of a variant in BLOG_MEDIA_VARIANT_ROOT, made on first request
+    """
+    path = os.path.join(get_variant_root(), file_name(media.content_hash, media.extension, width))
+    if not os.path.exists(path):
+        make_variant(media, width, path)
+    return path
+
+
+def delete_variants(media):
+    """
+    Remove the cached variants of media, variants of widths no longer configured are left behind
+    """
+    for width in variant_widths(media.width, media.extension):
+        path = os.path.join(get_variant_root(), file_name(media.content_hash, media.extension, width))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _media_prefix():
+    return reverse('media_file', kwargs={'name': 'x'})[:-1]
+
+
+class MediaImageTreeprocessor(Treeprocessor):
+    """
+    Point images of uploaded media at their variants with srcset, sizes and dimensions
+    """
+    def run(self, root):
+        from .models import Media
+
+        prefix = _media_prefix()
+        images = {}
+        for element in root.iter('img'):
+            src = element.get('src', '')
+            match = FILE_NAME_RE.fullmatch(src[len(prefix):]) if src.startswith(prefix) else None
+            if match is not None and match.group('width') is None:
+                images.setdefault(match.group('hash'), []).append(element)
+        if not images:
+            return
+        # media are immutable per content hash, so the HTML can be cached by the body alone
+        for content_hash, extension, width, height in Media.objects.filter(
+            content_hash__in=images, width__isnull=False
+        ).values_list('content_hash', 'extension', 'width', 'height').distinct():
+            widths = variant_widths(width, extension)
+            for element in images[content_hash]:
+                element.set('width', str(width))
+                element.set('height', str(height))
+                element.set('loading', 'lazy')
+                if widths:
+                    urls = [(reverse('media_file', kwargs={
+                        'name': file_name(content_hash, extension, variant),
+                    }), variant) for variant in widths]
+                    element.set('src', urls[-1][0])
+                    element.set('srcset', ', '.join('%s %dw' % url for url in urls))
+                    element.set('sizes', get_image_sizes())
+
+
+class MediaImageExtension(Extension):
+    def extendMarkdown(self, md):
+        md.treeprocessors.register(MediaImageTreeprocessor(md), 'blog_media_images', 5)
@@ -0,0 +1,156 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('blog_engine_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Timings collected while serving one request
+    """
+    __slots__ = ('queries', 'db_time', 'template_time', 'markdown_time', 'active')
+
+    def __init__(self):
+        self.active = set()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.markdown_time = 0.0
+
+    def server_timing(self, total):
+        return 'db;dur=%.2f;desc="%d queries", tpl;dur=%.2f, md;dur=%.2f, total;dur=%.2f' % (
+            self.db_time * 1000, self.queries, self.template_time * 1000,
+            self.markdown_time * 1000, total * 1000,
+        )
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def get_request_metrics():
+    return _current.get()
+
+
+@contextmanager
+def timer(attribute):
+    """
+    Add the time spent in the block to an attribute of the current request metrics
+
+    Nested timers for the same attribute are not counted twice.
+    """
+    metrics = _current.get()
+    if metrics is None or attribute in metrics.active:
+        yield
+        return
+    metrics.active.add(attribute)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(attribute)
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - start)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """
+    Connection execute wrapper counting queries and their time
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver adding query_wrapper to every new connection, in every thread
+    """
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'latency', 'queries', 'db_time', 'template_time', 'markdown_time')
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.markdown_time = 0.0
+
+
+class MetricsRegistry:
+    """
+    Process local aggregates per URL name, exposed in the Prometheus text format
+
+    Every worker process keeps its own registry, the scraper sums them.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, metrics, total):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if total <= bound:
+                    stats.buckets[index] += 1
+            stats.count += 1
+            stats.latency += total
+            stats.queries += metrics.queries
+            stats.db_time += metrics.db_time
+            stats.template_time += metrics.template_time
+            stats.markdown_time += metrics.markdown_time
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP blog_request_duration_seconds Request latency by URL name',
+                '# TYPE blog_request_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append('blog_request_duration_seconds_bucket{view="%s",le="%s"} %d' % (view, bound, count))
+                lines.append('blog_request_duration_seconds_bucket{view="%s",le="+Inf"} %d' % (view, stats.count))
+                lines.append('blog_request_duration_seconds_sum{view="%s"} %f' % (view, stats.latency))
+                lines.append('blog_request_duration_seconds_count{view="%s"} %d' % (view, stats.count))
+            for name, attribute, help_text in (
+                ('blog_db_queries_total', 'queries', 'Database queries'),
+                ('blog_db_duration_seconds_total', 'db_time', 'Time spent in database queries'),
+                ('blog_template_duration_seconds_total', 'template_time', 'Time spent rendering templates'),
+                ('blog_markdown_duration_seconds_total', 'markdown_time', 'Time spent rendering Markdown'),
+            ):
+                lines.append('# HELP %s %s by URL name' % (name, help_text))
+                lines.append('# TYPE %s counter' % name)
+                for view, stats in views:
+                    value = getattr(stats, attribute)
+                    lines.append('%s{view="%s"} %s' % (name, view, value if isinstance(value, int) else '%f' % value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
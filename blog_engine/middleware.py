@@ -0,0 +1,264 @@
+import asyncio
+import time
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from . import hits
+from . import metrics
+from . import routers
+from .caching import cap_timeout, get_page_cache, get_page_cache_key
+
+CACHEABLE_URL_NAMES = frozenset(('posts_list', 'post_detail', 'tag_posts_list', 'tags_list', 'browse', 'popular_posts'))
+REPLICA_URL_NAMES = CACHEABLE_URL_NAMES | {'feed', 'tag_feed', 'sitemap', 'sitemap_section', 'media_file'}
+PRIMARY_COOKIE_NAME = 'blog_primary_until'
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs in both WSGI and ASGI stacks without an adapter
+
+    Subclasses implement handle(request) and ahandle(request), the latter is
+    used when the rest of the stack is async, like Django's MiddlewareMixin.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # makes Django await this instance
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class AnonymousPageCacheMiddleware(HybridMiddleware):
+    """
+    Serve public pages to anonymous readers from the page cache
+
+    Must come after AuthenticationMiddleware. Authenticated requests always
+    bypass the cache, cached pages are purged by the signal handlers.
+    """
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in CACHEABLE_URL_NAMES
+
+    def lookup(self, request):
+        """
+        Return (cache key, cached response), the key is None for uncacheable requests
+        """
+        if not self.is_cacheable_request(request):
+            return None, None
+        key = get_page_cache_key(request)
+        return key, get_page_cache().get(key)
+
+    def store(self, key, response):
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            # timings belong to the request that rendered the page, not to the hits replaying it
+            if response.has_header('Server-Timing'):
+                del response['Server-Timing']
+            timeout = cap_timeout(getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60 * 10))
+            get_page_cache().set(key, response, timeout)
+            response['X-Page-Cache'] = 'MISS'
+
+    def handle(self, request):
+        key, response = self.lookup(request)
+        if response is not None:
+            response['X-Page-Cache'] = 'HIT'
+            return response
+        response = self.get_response(request)
+        if key is not None:
+            self.store(key, response)
+        return response
+
+    async def ahandle(self, request):
+        # the user lookup and the cache backend block, keep them off the event loop
+        key, response = await sync_to_async(self.lookup)(request)
+        if response is not None:
+            response['X-Page-Cache'] = 'HIT'
+            return response
+        response = await self.get_response(request)
+        if key is not None:
+            await sync_to_async(self.store)(key, response)
+        return response
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Time queries, template rendering, Markdown rendering and the whole request
+
+    Should come first so the total includes the other middleware and the
+    page cache stores its pages before the timings are added. Totals are
+    aggregated per URL name for the metrics endpoint and sent in a
+    Server-Timing header to staff users, or to everyone when
+    BLOG_SERVER_TIMING (DEBUG by default) is set. Disabled with
+    BLOG_METRICS_ENABLED = False. Queries are
+    counted by the execute wrapper every connection gets when it is created,
+    so queries of worker threads are included.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = getattr(settings, 'BLOG_METRICS_ENABLED', True)
+        self.public_server_timing = getattr(settings, 'BLOG_SERVER_TIMING', settings.DEBUG)
+
+    def sends_server_timing(self, request):
+        # query counts and timings tell readers more about the site than they need
+        if self.public_server_timing:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def handle(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        start = time.perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, request_metrics, start, self.sends_server_timing(request))
+
+    async def ahandle(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        # the user may not have been loaded yet, that is a blocking lookup
+        server_timing = self.public_server_timing or await sync_to_async(self.sends_server_timing)(request)
+        return self.finish(request, response, request_metrics, start, server_timing)
+
+    def finish(self, request, response, request_metrics, start, server_timing):
+        total = time.perf_counter() - start
+        if server_timing:
+            response['Server-Timing'] = request_metrics.server_timing(total)
+        metrics.registry.observe(self.get_url_name(request), request_metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # template response middleware runs in reverse, so this is right before rendering
+        request_metrics = metrics.get_request_metrics()
+        if request_metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.template_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def get_url_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # responses served by the page cache never reach URL resolution
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unresolved'
+        return match.url_name or 'unnamed'
+
+
+class PostViewCountMiddleware(HybridMiddleware):
+    """
+    Count the views of post detail pages into the buffer of hits.counter
+
+    Must come before ReplicaRoutingMiddleware and AnonymousPageCacheMiddleware,
+    so pages served from the page cache are counted and the periodic flush
+    writes to the primary. Conditional requests answered with 304 count too.
+    """
+    def count(self, request, response):
+        """
+        Return True when the buffered views are due to be flushed
+        """
+        if request.method != 'GET' or response.status_code not in (200, 304):
+            return False
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # responses served by the page cache never reach URL resolution
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return False
+        if match.url_name != 'post_detail':
+            return False
+        return hits.counter.add(match.kwargs['slug'])
+
+    def handle(self, request):
+        response = self.get_response(request)
+        if self.count(request, response):
+            hits.counter.flush()
+        return response
+
+    async def ahandle(self, request):
+        response = await self.get_response(request)
+        if self.count(request, response):
+            await sync_to_async(hits.counter.flush)()
+        return response
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Route the queries of read-only views to a replica from BLOG_DATABASE_REPLICAS
+
+    Requests that wrote to the primary set a cookie that keeps the client on
+    the primary for BLOG_REPLICA_STICKY_SECONDS, so an editor never reads a
+    replica that has not caught up with their own change yet.
+    """
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def start(self, request):
+        alias = None
+        if request.method in ('GET', 'HEAD') and not self.is_pinned(request):
+            alias = routers.choose_replica()
+        request.replica_alias = alias
+        return routers.start_request()
+
+    def finish(self, response, wrote):
+        if wrote:
+            sticky = getattr(settings, 'BLOG_REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                PRIMARY_COOKIE_NAME, '%d' % (time.time() + sticky), max_age=sticky, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def handle(self, request):
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+            wrote = routers.has_written()
+        finally:
+            routers.end_request(token)
+        return self.finish(response, wrote)
+
+    async def ahandle(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+            wrote = routers.has_written()
+        finally:
+            routers.end_request(token)
+        return self.finish(response, wrote)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # authentication and session lookups before this point stay on the primary
+        if request.replica_alias is not None and request.resolver_match.url_name in REPLICA_URL_NAMES:
+            routers.route_reads(request.replica_alias)
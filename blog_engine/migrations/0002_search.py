@@ -0,0 +1,73 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:19
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+POSTGRES_FORWARD = '''
+CREATE INDEX blog_engine_post_search_vector_gin ON blog_engine_post USING gin (search_vector);
+
+CREATE FUNCTION blog_engine_post_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.body, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER blog_engine_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, body ON blog_engine_post
+    FOR EACH ROW EXECUTE PROCEDURE blog_engine_post_search_vector_update();
+
+UPDATE blog_engine_post SET title = title;
+'''
+
+POSTGRES_BACKWARD = '''
+DROP TRIGGER IF EXISTS blog_engine_post_search_vector_trigger ON blog_engine_post;
+DROP FUNCTION IF EXISTS blog_engine_post_search_vector_update();
+DROP INDEX IF EXISTS blog_engine_post_search_vector_gin;
+'''
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FORWARD)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='body',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='blog_engine.Post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0003_post_body_html'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-date_pub', '-id'], name='post_date_pub_id_idx'),
+        ),
+    ]
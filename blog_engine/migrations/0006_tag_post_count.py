@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tag_posts(apps, schema_editor):
+    Post = apps.get_model('blog_engine', 'Post')
+    Tag = apps.get_model('blog_engine', 'Tag')
+    counts = Post.tags.through.objects.filter(tag=OuterRef('pk')).order_by().values('tag').annotate(
+        count=Count('pk')
+    ).values('count')
+    Tag.objects.update(post_count=Coalesce(Subquery(counts, output_field=models.IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0005_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-post_count', 'title'], name='tag_post_count_title_idx'),
+        ),
+        migrations.RunPython(count_tag_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0006_tag_post_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_item', serialize=False, to='blog_engine.Post')),
+                ('date_pub', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(db_index=True)),
+                ('atom', models.TextField()),
+                ('rss', models.TextField()),
+                ('json', models.TextField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['-date_pub', '-post'], name='feeditem_date_pub_post_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:49
+
+import html
+import re
+
+import markdown
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+def fill_body_text(apps, schema_editor):
+    Post = apps.get_model('blog_engine', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'body', 'body_html').iterator(chunk_size=500):
+        if post.body and not post.body_html:
+            # 0003 added body_html empty, the body_hash left empty makes the next save or
+            # render_markdown replace this with the full renderer's output
+            post.body_html = markdown.markdown(
+                post.body,
+                extensions=getattr(settings, 'BLOG_MARKDOWN_EXTENSIONS', []),
+                extension_configs=getattr(settings, 'BLOG_MARKDOWN_EXTENSION_CONFIGS', {}),
+            )
+        post.body_text = re.sub(r'\s+', ' ', html.unescape(strip_tags(post.body_html))).strip()
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['body_html', 'body_text'])
+            batch = []
+    Post.objects.bulk_update(batch, ['body_html', 'body_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0008_related_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='body_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='searchindexentry',
+            name='offset',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        # offsets of existing index rows stay empty until rebuild_search_index runs
+        migrations.RunPython(fill_body_text, migrations.RunPython.noop),
+    ]
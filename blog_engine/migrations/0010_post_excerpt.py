@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:50
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpt(apps, schema_editor):
+    Post = apps.get_model('blog_engine', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'body_text').iterator(chunk_size=500):
+        post.excerpt = Truncator(Truncator(post.body_text).words(15)).chars(255)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0009_search_snippets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_engine', '0012_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostStats',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='blog_engine.post')),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('popularity', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='poststats',
+            index=models.Index(fields=['-popularity', '-post'], name='poststats_popularity_idx'),
+        ),
+    ]
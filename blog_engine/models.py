@@ -1,39 +1,143 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.shortcuts import reverse
-from django.utils.text import slugify
+from django.utils import timezone
 from django.utils.html import mark_safe
 
-from markdown import markdown
+from .metrics import timer
+from .rendering import get_body_hash, get_cached_html, html_to_text, make_excerpt, render_markdown
+from .search import get_search_backend
+from .slugs import save_with_unique_slug
+
+
+class PostQuerySet(models.QuerySet):
+    def published(self, now=None):
+        """
+        Posts visible to readers, served from the (status, date_pub) index
+        """
+        return self.filter(status=Post.PUBLISHED, date_pub__lte=now or timezone.now())
+
+    def scheduled(self, now=None):
+        """
+        Published posts whose publish time is still in the future
+        """
+        return self.filter(status=Post.PUBLISHED, date_pub__gt=now or timezone.now())
 
 
 class Post(models.Model):
+    DRAFT = 'draft'
+    PUBLISHED = 'published'
+    STATUS_CHOICES = (
+        (DRAFT, 'Draft'),
+        (PUBLISHED, 'Published'),
+    )
+
     title = models.CharField(max_length=150, db_index=True)
     slug = models.SlugField(max_length=150, unique=True)
-    body = models.TextField(blank=True, db_index=True)
+    body = models.TextField(blank=True)
     tags = models.ManyToManyField('Tag', blank=True, related_name='posts')
-    date_pub = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PUBLISHED)
+    # published posts with a future date_pub are scheduled and go live at that time
+    date_pub = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    body_html = models.TextField(blank=True, editable=False)
+    body_hash = models.CharField(max_length=40, blank=True, editable=False)
+    body_text = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=255, blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_pub', '-id'], name='post_date_pub_id_idx'),
+            models.Index(fields=['status', '-date_pub', '-id'], name='post_status_date_pub_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
         """
-        Auto add slug when saving new model
+        Auto add slug when saving new model and re-render the body if it changed
         """
-        if not self.slug:
-            self.slug = slugify(self.title)
-        super(Post, self).save(*args, **kwargs)
+        self.render_body()
+        if self.slug:
+            super(Post, self).save(*args, **kwargs)
+        else:
+            save_with_unique_slug(self, lambda: super(Post, self).save(*args, **kwargs))
+        get_search_backend().update(self)
 
     def get_absolute_url(self):
         return reverse('post_detail', kwargs={'slug': self.slug})
 
+    @property
+    def state(self):
+        """
+        'draft', 'scheduled' or 'published'
+        """
+        if self.status == self.PUBLISHED and self.date_pub > timezone.now():
+            return 'scheduled'
+        return self.status
+
+    def render_body(self):
+        """
+        Refresh body_html, body_text and excerpt when the body or the Markdown config changed, return True if it did
+        """
+        body_hash = get_body_hash(self.body)
+        if body_hash == self.body_hash:
+            return False
+        self.body_html = render_markdown(self.body)
+        self.body_text = html_to_text(self.body_html)
+        self.excerpt = make_excerpt(self.body_text)
+        self.body_hash = body_hash
+        return True
+
     def get_body_as_markdown(self):
-        return mark_safe(markdown(self.body, safe_mode='escape'))
+        with timer('markdown_time'):
+            body_hash = get_body_hash(self.body)
+            if body_hash == self.body_hash:
+                return mark_safe(self.body_html)
+            return mark_safe(get_cached_html(self.body, body_hash))
+
+
+class TagQuerySet(models.QuerySet):
+    def popular(self, limit=None):
+        """
+        Tags with the most posts first, served from the post_count index
+        """
+        queryset = self.order_by('-post_count', 'title')
+        if limit is not None:
+            queryset = queryset[:limit]
+        return queryset
+
+    def update_post_counts(self):
+        """
+        Recount the posts readers can see for the tags in this queryset with a single UPDATE
+
+        Scheduled posts are left out until they go live, publish_scheduled() recounts their tags.
+        """
+        counts = Post.tags.through.objects.filter(
+            tag=models.OuterRef('pk'), post__status=Post.PUBLISHED, post__date_pub__lte=timezone.now()
+        ).order_by().values('tag').annotate(
+            count=models.Count('pk')
+        ).values('count')
+        return self.update(post_count=Coalesce(models.Subquery(counts, output_field=models.IntegerField()), 0))
 
 
 class Tag(models.Model):
     title = models.CharField(max_length=50)
     slug = models.SlugField(max_length=50, unique=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-post_count', 'title'], name='tag_post_count_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -42,9 +146,163 @@ class Tag(models.Model):
         """
         Auto add slug when saving new model
         """
-        if not self.slug:
-            self.slug = slugify(self.title)
-        super(Tag, self).save(*args, **kwargs)
+        if self.slug:
+            super(Tag, self).save(*args, **kwargs)
+        else:
+            save_with_unique_slug(self, lambda: super(Tag, self).save(*args, **kwargs))
 
     def get_absolute_url(self):
         return reverse('tag_posts_list', kwargs={'slug': self.slug})
+
+
+class SearchIndexEntry(models.Model):
+    """
+    Posting list row for the inverted index search backend
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_entries')
+    weight = models.PositiveIntegerField(default=1)
+    # first occurrence in Post.body_text, null for terms only in the title
+    offset = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        unique_together = ('term', 'post')
+
+    def __str__(self):
+        return self.term
+
+
+class FeedItem(models.Model):
+    """
+    Serialized feed entries of a post, rebuilt when the post or its tags change
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='feed_item')
+    date_pub = models.DateTimeField()
+    updated_at = models.DateTimeField(db_index=True)
+    atom = models.TextField()
+    rss = models.TextField()
+    json = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_pub', '-post'], name='feeditem_date_pub_post_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.post_id)
+
+
+class RelatedPost(models.Model):
+    """
+    Precomputed related posts by weighted tag overlap, refreshed when tags change
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('post', 'related')
+
+    def __str__(self):
+        return '%s -> %s' % (self.post_id, self.related_id)
+
+
+class Revision(models.Model):
+    """
+    One saved version of a post, a compressed line diff against the previous
+    revision or, every BLOG_REVISION_SNAPSHOT_INTERVAL revisions, a full snapshot
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    # number of the snapshot the diff chain of this revision starts at
+    base = models.PositiveIntegerField()
+    title = models.CharField(max_length=150)
+    data = models.BinaryField()
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('post', 'number')
+
+    def __str__(self):
+        return '%s #%d' % (self.post_id, self.number)
+
+    @property
+    def is_snapshot(self):
+        return self.base == self.number
+
+    def get_body(self):
+        from .revisions import get_revision_body
+
+        return get_revision_body(self)
+
+
+class PostStats(models.Model):
+    """
+    View count and popularity of a post, written in batches from the buffered views
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    views = models.PositiveBigIntegerField(default=0)
+    # log2 of the views weighted by how recent they are, see hits.add_views
+    popularity = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-popularity', '-post'], name='poststats_popularity_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.post_id)
+
+    def get_score(self, now=None):
+        from .hits import get_decayed_views
+
+        return get_decayed_views(self.popularity, now)
+
+
+class Media(models.Model):
+    """
+    A file attached to a post, images are served in resized variants made on first request
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media')
+    file = models.FileField(upload_to='blog_media/')
+    name = models.CharField(max_length=255)
+    # first 64 bits of the SHA-256 of the content, names the file and its variants
+    content_hash = models.CharField(max_length=16, db_index=True)
+    extension = models.CharField(max_length=10, blank=True)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveIntegerField()
+    # images Pillow can read, as they are displayed
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'media'
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        from .media import file_name
+
+        return reverse('media_file', kwargs={'name': file_name(self.content_hash, self.extension)})
+
+    @property
+    def is_image(self):
+        return self.width is not None
+
+    def get_variant_widths(self):
+        from .media import variant_widths
+
+        return variant_widths(self.width, self.extension)
+
+    @property
+    def markdown(self):
+        """
+        Markdown showing the file in a post body, images get their variants when rendered
+        """
+        name = self.name.replace('[', '\\[').replace(']', '\\]')
+        return '%s[%s](%s)' % ('!' if self.is_image else '', name, self.get_absolute_url())
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+# numbered pages linked on each side of the current one
+PAGE_WINDOW = 3
+
+
+def get_page_window(page, size=PAGE_WINDOW):
+    """
+    Numbers of the pages linked around a numbered page, without walking the whole page range
+    """
+    return range(max(1, page.number - size), min(page.paginator.num_pages, page.number + size) + 1)
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage:
+    """
+    A page of a keyset paginated queryset with opaque next/previous cursors
+    """
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over (date_pub, id), newest first
+
+    Every page is a single indexed range scan, so deep pages cost the same as
+    the first one. There is no COUNT(*) and no page numbers.
+    """
+    is_cursor = True
+
+    def __init__(self, queryset, per_page, field='date_pub'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, obj, backwards=False):
+        value = getattr(obj, self.field).isoformat()
+        raw = json.dumps([value, obj.pk, int(backwards)]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, pk, backwards = json.loads(raw.decode('utf-8'))
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+            raise InvalidCursor('Invalid cursor')
+        if value is None:
+            raise InvalidCursor('Invalid cursor')
+        return value, pk, bool(backwards)
+
+    def page(self, cursor=None):
+        field = self.field
+        backwards = False
+        queryset = self.queryset.order_by('-' + field, '-pk')
+        if cursor:
+            value, pk, backwards = self.decode_cursor(cursor)
+            if backwards:
+                queryset = self.queryset.filter(
+                    Q(**{field + '__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                ).order_by(field, 'pk')
+            else:
+                queryset = queryset.filter(
+                    Q(**{field + '__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                )
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], backwards=True) if rows and has_previous else None
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination for post list views
+
+    Enabled per view with cursor_pagination = True or globally with the
+    BLOG_CURSOR_PAGINATION setting. Querysets with a different ordering
+    (e.g. ranked search results) keep using the regular paginator.
+    """
+    cursor_pagination = None
+    cursor_kwarg = 'cursor'
+
+    def uses_cursor_pagination(self):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination
+        return getattr(settings, 'BLOG_CURSOR_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if page is not None and not isinstance(page, CursorPage):
+            context['page_window'] = get_page_window(page)
+        return context
@@ -0,0 +1,202 @@
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# posts considered per post, taken from its rarest tags first
+CANDIDATE_LIMIT = 500
+# keeps IN lists under SQLite's variable limit
+CHUNK_SIZE = 500
+
+
+def get_related_size():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 5)
+
+
+def tag_weight(post_count, total):
+    """
+    Inverse document frequency, a tag on half of the posts says little about them
+    """
+    return math.log(1 + total / max(post_count, 1))
+
+
+def _chunks(items):
+    items = list(items)
+    for i in range(0, len(items), CHUNK_SIZE):
+        yield items[i:i + CHUNK_SIZE]
+
+
+def _post_tags(post_ids):
+    """
+    Map post ids to {tag id: tag post_count}
+    """
+    from .models import Post
+
+    tags = {}
+    for chunk in _chunks(post_ids):
+        for post_id, tag_id, post_count in Post.tags.through.objects.filter(
+            post_id__in=chunk
+        ).values_list('post_id', 'tag_id', 'tag__post_count'):
+            tags.setdefault(post_id, {})[tag_id] = post_count
+    return tags
+
+
+def score_posts(post_ids, total=None):
+    """
+    Weighted Jaccard similarity of each post to the posts sharing its tags
+
+    Return {post id: {other post id: score}}. Candidates come from the rarest
+    tags first and are capped at CANDIDATE_LIMIT, so popular tags cost one
+    bounded query each.
+    """
+    from .models import Post
+
+    if total is None:
+        total = Post.objects.count()
+    own_tags = _post_tags(post_ids)
+    members = {}
+    for tag_id in {tag_id for tags in own_tags.values() for tag_id in tags}:
+        members[tag_id] = list(Post.tags.through.objects.filter(tag_id=tag_id).order_by(
+            '-post_id'
+        ).values_list('post_id', flat=True)[:CANDIDATE_LIMIT + 1])
+
+    candidates = {}
+    for post_id, tags in own_tags.items():
+        found = set()
+        for tag_id in sorted(tags, key=lambda tag_id: (tags[tag_id], tag_id)):
+            found.update(other for other in members[tag_id] if other != post_id)
+            if len(found) >= CANDIDATE_LIMIT:
+                break
+        candidates[post_id] = found
+
+    other_tags = _post_tags({other for found in candidates.values() for other in found} - set(own_tags))
+    other_tags.update(own_tags)
+
+    scores = {}
+    for post_id, found in candidates.items():
+        weights = {tag_id: tag_weight(count, total) for tag_id, count in own_tags[post_id].items()}
+        own_weight = sum(weights.values())
+        scores[post_id] = {}
+        for other in found:
+            tags = other_tags.get(other, {})
+            shared = sum(weights[tag_id] for tag_id in tags if tag_id in weights)
+            if not shared:
+                continue
+            other_weight = sum(tag_weight(count, total) for count in tags.values())
+            scores[post_id][other] = shared / (own_weight + other_weight - shared)
+    return scores
+
+
+def get_related_posts(post):
+    """
+    The stored related posts of a post, best match first, with one indexed query
+    """
+    return _related_posts(post=post)
+
+
+def get_related_posts_by_slug(slug):
+    """
+    Same as get_related_posts without having to load the post first
+    """
+    return _related_posts(post__slug=slug)
+
+
+def _related_posts(**lookup):
+    from .models import Post, RelatedPost
+
+    # lists are scored over every post, drafts and scheduled posts are skipped when read
+    entries = RelatedPost.objects.filter(
+        related__status=Post.PUBLISHED, related__date_pub__lte=timezone.now(), **lookup
+    ).select_related('related').only(
+        'related__title', 'related__slug', 'related__date_pub'
+    ).order_by('-score', '-related_id')
+    return [entry.related for entry in entries]
+
+
+def _top(scores, size):
+    return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:size]
+
+
+def _replace_lists(lists):
+    """
+    Store {post id: [(related id, score)]} replacing the current rows of those posts
+    """
+    from .models import RelatedPost
+
+    for chunk in _chunks(lists):
+        RelatedPost.objects.filter(post_id__in=chunk).delete()
+    RelatedPost.objects.bulk_create([
+        RelatedPost(post_id=post_id, related_id=related_id, score=score)
+        for post_id, related in lists.items()
+        for related_id, score in related
+    ])
+
+
+def recompute_related_posts(post_ids):
+    """
+    Rebuild the related posts lists of the given posts from scratch
+    """
+    scores = score_posts(post_ids)
+    size = get_related_size()
+    with transaction.atomic():
+        _replace_lists({post_id: _top(scores.get(post_id, {}), size) for post_id in post_ids})
+
+
+def refresh_related_posts(post_ids):
+    """
+    Update related posts after the tags of the given posts changed
+
+    The changed posts get new lists. Posts that listed one of them are
+    recomputed, every other post the changed posts now score against only
+    merges the new scores into its stored list and is only written when that
+    changes it. Return the ids of every post whose list was written.
+    """
+    from .models import RelatedPost
+
+    post_ids = set(post_ids)
+    if not post_ids:
+        return set()
+    size = get_related_size()
+    with transaction.atomic():
+        stale = set()
+        for chunk in _chunks(post_ids):
+            stale.update(RelatedPost.objects.filter(related_id__in=chunk).values_list('post_id', flat=True))
+        stale -= post_ids
+        scores = score_posts(post_ids | stale)
+
+        lists = {post_id: _top(scores.get(post_id, {}), size) for post_id in post_ids | stale}
+        offers = {}
+        for post_id in post_ids:
+            for other, score in scores.get(post_id, {}).items():
+                if other not in lists:
+                    offers.setdefault(other, {})[post_id] = score
+        current = {}
+        for chunk in _chunks(offers):
+            for post_id, related_id, score in RelatedPost.objects.filter(
+                post_id__in=chunk
+            ).values_list('post_id', 'related_id', 'score'):
+                current.setdefault(post_id, {})[related_id] = score
+        for other, offered in offers.items():
+            merged = _top({**current.get(other, {}), **offered}, size)
+            if merged != _top(current.get(other, {}), size):
+                lists[other] = merged
+        _replace_lists(lists)
+    return set(lists)
+
+
+def rebuild_related_posts(batch_size=500):
+    """
+    Recompute every related posts list, return the number of posts
+    """
+    from .models import Post
+
+    count = 0
+    last_pk = 0
+    while True:
+        post_ids = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not post_ids:
+            return count
+        recompute_related_posts(post_ids)
+        count += len(post_ids)
+        last_pk = post_ids[-1]
@@ -0,0 +1,85 @@
+import hashlib
+import html
+import json
+import re
+
+import markdown as markdown_lib
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from . import media
+from .metrics import timer
+
+MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24
+WHITESPACE_RE = re.compile(r'\s+')
+EXCERPT_WORDS = 15
+EXCERPT_LENGTH = 255
+
+
+def get_markdown_extensions():
+    return getattr(settings, 'BLOG_MARKDOWN_EXTENSIONS', [])
+
+
+def get_markdown_extension_configs():
+    return getattr(settings, 'BLOG_MARKDOWN_EXTENSION_CONFIGS', {})
+
+
+def get_renderer_signature():
+    """
+    Identify the Markdown version and extension config the HTML was rendered with
+    """
+    return json.dumps([
+        markdown_lib.__version__,
+        get_markdown_extensions(),
+        get_markdown_extension_configs(),
+        # images of uploaded media list their variants
+        media.get_variant_widths() if media.Image is not None else [],
+    ], sort_keys=True, default=str)
+
+
+def get_body_hash(body):
+    """
+    Hash of the body and the renderer signature, changes when either does
+    """
+    digest = hashlib.sha1(get_renderer_signature().encode('utf-8'))
+    digest.update(body.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_markdown(body):
+    with timer('markdown_time'):
+        return markdown_lib.markdown(
+            body,
+            safe_mode='escape',
+            extensions=get_markdown_extensions() + [media.MediaImageExtension()],
+            extension_configs=get_markdown_extension_configs(),
+        )
+
+
+def get_cached_html(body, body_hash=None):
+    """
+    Read-through cache keyed by the content hash so each body is rendered once
+    """
+    body_hash = body_hash or get_body_hash(body)
+    key = 'blog_engine:markdown:%s' % body_hash
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(body)
+        cache.set(key, html, MARKDOWN_CACHE_TIMEOUT)
+    return html
+
+
+def html_to_text(body_html):
+    """
+    Plain text of rendered HTML with whitespace collapsed, for search and snippets
+    """
+    return WHITESPACE_RE.sub(' ', html.unescape(strip_tags(body_html))).strip()
+
+
+def make_excerpt(text):
+    """
+    The first EXCERPT_WORDS words of plain text, capped to fit Post.excerpt
+    """
+    return Truncator(Truncator(text).words(EXCERPT_WORDS)).chars(EXCERPT_LENGTH)
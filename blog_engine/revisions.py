@@ -0,0 +1,105 @@
+import difflib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+
+def get_snapshot_interval():
+    return getattr(settings, 'BLOG_REVISION_SNAPSHOT_INTERVAL', 10)
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def make_delta(old, new):
+    """
+    Line diff turning old into new: [start, end] copies old lines, a list of strings inserts new ones
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    delta = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append(new_lines[j1:j2])
+    return delta
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in delta:
+        if isinstance(op[0], int):
+            parts.extend(old_lines[op[0]:op[1]])
+        else:
+            parts.extend(op)
+    return ''.join(parts)
+
+
+def get_revision_body(revision):
+    """
+    Rebuild the body of a revision from its snapshot
+
+    One query loads the chain, which is never longer than the snapshot interval.
+    """
+    from .models import Revision
+
+    chain = Revision.objects.filter(
+        post_id=revision.post_id, number__gte=revision.base, number__lte=revision.number
+    ).order_by('number').values_list('number', 'data')
+    body = None
+    for number, data in chain:
+        value = _unpack(data)
+        body = value if body is None else apply_delta(body, value)
+    return body
+
+
+def record_revision(post, author=None, created_at=None):
+    """
+    Store the current title and body of a saved post as its next revision
+
+    Returns the new revision, or None when nothing changed since the last one.
+    """
+    from .models import Revision
+
+    with transaction.atomic():
+        latest = Revision.objects.select_for_update().filter(post=post).order_by('-number').first()
+        if latest is None:
+            number, base, data = 1, 1, _pack(post.body)
+        else:
+            previous = get_revision_body(latest)
+            if previous == post.body and latest.title == post.title:
+                return None
+            number = latest.number + 1
+            snapshot = _pack(post.body)
+            data = _pack(make_delta(previous, post.body))
+            base = latest.base
+            # a long chain or a diff bigger than the whole body starts a new snapshot
+            if number - base >= get_snapshot_interval() or len(data) >= len(snapshot):
+                base, data = number, snapshot
+        revision = Revision(post=post, number=number, base=base, title=post.title, data=data, author=author)
+        if created_at is not None:
+            revision.created_at = created_at
+        revision.save()
+    return revision
+
+
+def diff_lines(old, new):
+    """
+    Unified diff of two bodies as (css class, line) pairs for the history view
+    """
+    classes = {'+': 'text-success', '-': 'text-danger', '@': 'text-info'}
+    lines = []
+    for line in difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm=''):
+        if line.startswith(('+++', '---')):
+            continue
+        lines.append((classes.get(line[:1], ''), line))
+    return lines
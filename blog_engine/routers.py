@@ -0,0 +1,59 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_read_alias = ContextVar('blog_engine_read_alias', default=None)
+_writes = ContextVar('blog_engine_writes', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'BLOG_DATABASE_REPLICAS', [])
+
+
+def choose_replica():
+    replicas = get_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+def start_request():
+    """
+    Reset routing for a new request: reads go to the primary until route_reads is called
+    """
+    return _read_alias.set(None), _writes.set([])
+
+
+def end_request(token):
+    read_token, writes_token = token
+    _read_alias.reset(read_token)
+    _writes.reset(writes_token)
+
+
+def route_reads(alias):
+    _read_alias.set(alias)
+
+
+def has_written():
+    return bool(_writes.get())
+
+
+class ReplicaRouter:
+    """
+    Read from the replica chosen for the current request, write to the primary
+
+    Outside of requests routed by ReplicaRoutingMiddleware every query goes
+    to the primary. All aliases hold the same data, so relations between
+    objects read from different aliases are allowed.
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and not writes:
+            writes.append(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
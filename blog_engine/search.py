@@ -0,0 +1,228 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, Lower, NullIf, StrIndex, Substr
+from django.utils.html import escape, mark_safe
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with',
+))
+
+TITLE_WEIGHT = 4
+# characters of body_text in a snippet and how many of them come before the first match
+SNIPPET_LENGTH = 200
+SNIPPET_LEAD = 60
+
+
+def iter_terms(text):
+    """
+    Yield (term, offset) for the lowercase search terms of text without stop words
+    """
+    for match in TOKEN_RE.finditer(text):
+        token = match.group().lower()
+        if token not in STOP_WORDS and len(token) <= 64:
+            yield token, match.start()
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms without stop words
+    """
+    return [term for term, offset in iter_terms(text)]
+
+
+class PostgresSearchBackend:
+    """
+    Full-text search over Post.search_vector
+
+    The vector is maintained by a database trigger (see migration 0002),
+    so there is nothing to do on save.
+    """
+    config = 'english'
+
+    def update(self, post):
+        pass
+
+    def update_many(self, posts):
+        pass
+
+    def remove(self, post):
+        pass
+
+    def rebuild(self, queryset, batch_size=None):
+        queryset.update(title=F('title'))
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=self.config)
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).filter(search_vector=search_query).order_by('-rank', '-date_pub')
+
+    def highlight(self, posts, query):
+        """
+        Attach snippets to an already sliced page of posts
+
+        The window is located with strpos on body_text, so unlike ts_headline
+        Postgres never parses the whole body of a long post.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return attach_snippets(posts, terms, Value(None, output_field=IntegerField()))
+        positions = [NullIf(StrIndex(Lower('body_text'), Value(term)), Value(0)) for term in sorted(terms)]
+        first = Least(*positions) if len(positions) > 1 else positions[0]
+        return attach_snippets(posts, terms, first - 1)
+
+
+class InvertedIndexSearchBackend:
+    """
+    Database agnostic search backed by the SearchIndexEntry posting table
+
+    Terms are ANDed like plainto_tsquery and ranked by summed term weight.
+    """
+
+    def update(self, post):
+        self.update_many([post])
+
+    def update_many(self, posts):
+        """
+        Replace the posting rows of several saved posts with one delete and one insert
+        """
+        from .models import SearchIndexEntry
+
+        entries = []
+        for post in posts:
+            weights = Counter()
+            offsets = {}
+            for term in tokenize(post.title):
+                weights[term] += TITLE_WEIGHT
+            for term, offset in iter_terms(post.body_text):
+                weights[term] += 1
+                offsets.setdefault(term, offset)
+            entries.extend(
+                SearchIndexEntry(term=term, post_id=post.pk, weight=weight, offset=offsets.get(term))
+                for term, weight in weights.items()
+            )
+        with transaction.atomic():
+            SearchIndexEntry.objects.filter(post__in=[post.pk for post in posts]).delete()
+            SearchIndexEntry.objects.bulk_create(entries)
+
+    def remove(self, post):
+        from .models import SearchIndexEntry
+
+        SearchIndexEntry.objects.filter(post=post).delete()
+
+    def rebuild(self, queryset, batch_size=500):
+        batch = []
+        for post in queryset.only('pk', 'title', 'body_text').iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) >= batch_size:
+                self.update_many(batch)
+                batch = []
+        if batch:
+            self.update_many(batch)
+
+    def search(self, queryset, query):
+        from .models import SearchIndexEntry
+
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return queryset.none()
+        entries = SearchIndexEntry.objects.filter(term__in=terms)
+        matching = entries.values('post').annotate(
+            matched=Count('term')
+        ).filter(matched=len(terms)).values('post')
+        rank = entries.filter(post=OuterRef('pk')).values('post').annotate(
+            score=Sum('weight')
+        ).values('score')
+        return queryset.filter(pk__in=matching).annotate(
+            rank=Subquery(rank, output_field=IntegerField())
+        ).order_by('-rank', '-date_pub')
+
+    def highlight(self, posts, query):
+        """
+        Attach snippets to an already sliced page of posts from the stored term offsets
+        """
+        from .models import SearchIndexEntry
+
+        terms = set(tokenize(query))
+        if not terms:
+            return attach_snippets(posts, terms, Value(None, output_field=IntegerField()))
+        first = SearchIndexEntry.objects.filter(
+            post=OuterRef('pk'), term__in=terms, offset__isnull=False
+        ).order_by('offset').values('offset')[:1]
+        return attach_snippets(posts, terms, Subquery(first, output_field=IntegerField()))
+
+
+def attach_snippets(posts, terms, offset):
+    """
+    Set post.headline on each post to a highlighted snippet of its body_text
+
+    offset is an expression for the position of the first match in body_text,
+    NULL starts at the beginning. One query fetches just the window of every
+    post, so long bodies are neither loaded nor scanned.
+    """
+    from .models import Post
+
+    posts = list(posts)
+    start = Greatest(Coalesce(offset, Value(0)) - SNIPPET_LEAD, Value(0)) + 1
+    windows = {
+        pk: (snippet_start, window)
+        for pk, snippet_start, window in Post.objects.filter(pk__in=[post.pk for post in posts]).annotate(
+            snippet_start=start
+        ).annotate(
+            # one extra character tells whether the text goes on after the window
+            snippet=Substr('body_text', F('snippet_start'), SNIPPET_LENGTH + 1)
+        ).values_list('pk', 'snippet_start', 'snippet')
+    }
+    for post in posts:
+        snippet_start, window = windows.get(post.pk, (1, ''))
+        post.headline = make_snippet(window or '', terms, snippet_start > 1, len(window or '') > SNIPPET_LENGTH)
+    return posts
+
+
+def make_snippet(window, terms, clipped_start=False, clipped_end=False):
+    """
+    Escape a window of plain text and wrap the matched terms in <mark>
+
+    Words cut by the window edges are dropped and replaced by an ellipsis.
+    """
+    if clipped_start:
+        space = window.find(' ')
+        if 0 <= space < SNIPPET_LEAD:
+            window = window[space + 1:]
+    if clipped_end:
+        window = window[:SNIPPET_LENGTH]
+        space = window.rfind(' ')
+        if space > SNIPPET_LEAD:
+            window = window[:space]
+    parts = ['&hellip; '] if clipped_start else []
+    last = 0
+    for match in TOKEN_RE.finditer(window):
+        if match.group().lower() in terms:
+            parts.append(escape(window[last:match.start()]))
+            parts.append('<mark>%s</mark>' % escape(match.group()))
+            last = match.end()
+    parts.append(escape(window[last:]))
+    if clipped_end:
+        parts.append(' &hellip;')
+    return mark_safe(''.join(parts))
+
+
+def get_search_backend():
+    """
+    Return the backend from BLOG_SEARCH_BACKEND or pick one for the default database
+    """
+    backend_path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return InvertedIndexSearchBackend()
@@ -0,0 +1,129 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from .caching import invalidate_tag_cloud, purge_all_pages, purge_paths, purge_post_pages, schedule_next_publish
+from .feeds import purge_feeds, rebuild_feed_items, update_feed_items
+from .media import delete_variants
+from .models import Media, Post, RelatedPost, Revision, Tag
+from .related import recompute_related_posts, refresh_related_posts
+from .revisions import record_revision
+
+
+def purge_detail_pages(post_ids):
+    purge_paths(post.get_absolute_url() for post in Post.objects.filter(pk__in=post_ids).only('slug'))
+
+
+def purge_listing_pages(post):
+    """
+    Drop the detail pages that show post as a related post
+    """
+    purge_paths(
+        reverse('post_detail', kwargs={'slug': slug})
+        for slug in RelatedPost.objects.filter(related=post).values_list('post__slug', flat=True)
+    )
+
+
+def refresh_related(post_ids):
+    purge_detail_pages(refresh_related_posts(post_ids))
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # posts created before revisions existed, or by the bulk import, get their stored version as the first one
+    if instance.pk is not None and not Revision.objects.filter(post_id=instance.pk).exists():
+        stored = Post.objects.filter(pk=instance.pk).only('title', 'body', 'updated_at').first()
+        if stored is not None:
+            record_revision(stored, created_at=stored.updated_at)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    record_revision(instance, author=getattr(instance, '_revision_author', None))
+    purge_post_pages(instance)
+    # related post links show the title and slug and are hidden until the post is published
+    purge_listing_pages(instance)
+    update_feed_items([instance])
+    purge_feeds(instance.tags.values_list('slug', flat=True))
+    if not created:
+        # drafts are not counted, the status may have changed
+        Tag.objects.filter(posts=instance).update_post_counts()
+        invalidate_tag_cloud()
+    schedule_next_publish()
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        # feed items carry the tag titles as categories
+        rebuild_feed_items(Post.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # the through rows are removed by the cascade without m2m_changed
+    instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    # posts listing this one as related lose an entry
+    instance._related_post_ids = list(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    Tag.objects.filter(pk__in=getattr(instance, '_deleted_tag_ids', [])).update_post_counts()
+    recompute_related_posts(getattr(instance, '_related_post_ids', []))
+    purge_detail_pages(getattr(instance, '_related_post_ids', []))
+    schedule_next_publish()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    instance._deleted_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    refresh_related(getattr(instance, '_deleted_post_ids', []))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Post)
+def tag_or_post_changed(sender, **kwargs):
+    # the tag cloud and its counts are on every page
+    invalidate_tag_cloud()
+    purge_all_pages()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+        else:
+            instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        tag_ids = [instance.pk]
+        post_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_post_ids', [])
+        posts = Post.objects.filter(pk__in=post_ids)
+    else:
+        tag_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_tag_ids', [])
+        posts = [instance]
+    Tag.objects.filter(pk__in=tag_ids).update_post_counts()
+    update_feed_items(posts)
+    refresh_related([post.pk for post in posts])
+    invalidate_tag_cloud()
+    purge_all_pages()
+
+
+@receiver(post_delete, sender=Media)
+def media_deleted(sender, instance, **kwargs):
+    # also sent for the media of a deleted post
+    instance.file.delete(save=False)
+    # variants are named after the content, other uploads of the same file share them
+    if not Media.objects.filter(content_hash=instance.content_hash, extension=instance.extension).exists():
+        delete_variants(instance)
@@ -0,0 +1,113 @@
+from xml.sax.saxutils import escape
+
+from django.urls import reverse
+
+from .feeds import get_site_url
+from .models import Post, Tag
+
+SITEMAP_MAX_URLS = 50000
+CHUNK_SIZE = 2000
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SECTIONS = ('pages', 'posts', 'tags')
+
+
+def _queryset_for(section):
+    return Post.objects.published() if section == 'posts' else Tag.objects.all()
+
+
+def _iter_rows(section, start_pk=0, limit=None):
+    """
+    Yield (path, lastmod) for a section in primary key order using keyset chunks
+    """
+    if section == 'pages':
+        yield reverse('posts_list'), None
+        yield reverse('tags_list'), None
+        return
+    queryset = _queryset_for(section)
+    url_name = 'post_detail' if section == 'posts' else 'tag_posts_list'
+    # reverse once and substitute slugs instead of resolving every URL
+    prefix, _, suffix = reverse(url_name, kwargs={'slug': 'slug'}).rpartition('slug')
+    fields = ('pk', 'slug', 'updated_at') if section == 'posts' else ('pk', 'slug')
+    last_pk = start_pk - 1
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(*fields)[:size])
+        if not rows:
+            return
+        for row in rows:
+            yield prefix + row[1] + suffix, row[2] if len(row) > 2 else None
+        last_pk = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def iter_urlset(rows):
+    """
+    Stream a <urlset> document for (path, lastmod) rows
+    """
+    site_url = get_site_url()
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="%s">\n' % SITEMAP_NS
+    for path, lastmod in rows:
+        if lastmod is not None:
+            yield '<url><loc>%s</loc><lastmod>%s</lastmod></url>\n' % (
+                escape(site_url + path), lastmod.date().isoformat()
+            )
+        else:
+            yield '<url><loc>%s</loc></url>\n' % escape(site_url + path)
+    yield '</urlset>\n'
+
+
+def iter_section_starts(section):
+    """
+    Yield the first primary key of every sitemap file of a section
+    """
+    if section == 'pages':
+        yield 0
+        return
+    pks = _queryset_for(section).order_by('pk').values_list('pk', flat=True)
+    for index, pk in enumerate(pks.iterator(chunk_size=CHUNK_SIZE)):
+        if index % SITEMAP_MAX_URLS == 0:
+            yield pk
+
+
+def iter_sitemap_files():
+    """
+    Yield (section, start_pk) for every file listed in the sitemap index
+    """
+    for section in SECTIONS:
+        for start in iter_section_starts(section):
+            yield section, start
+
+
+def get_section_path(section, start):
+    return reverse('sitemap_section', kwargs={'section': section, 'start': start})
+
+
+def iter_index(files, get_path=get_section_path):
+    """
+    Stream a <sitemapindex> document for (section, start_pk) files, get_path maps them to their paths
+    """
+    site_url = get_site_url()
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="%s">\n' % SITEMAP_NS
+    for section, start in files:
+        yield '<sitemap><loc>%s</loc></sitemap>\n' % escape(site_url + get_path(section, start))
+    yield '</sitemapindex>\n'
+
+
+def needs_index():
+    return Post.objects.published().count() + Tag.objects.count() + 2 > SITEMAP_MAX_URLS
+
+
+def iter_sitemap():
+    """
+    The root sitemap: a single urlset for small sites, an index past SITEMAP_MAX_URLS
+    """
+    if needs_index():
+        return iter_index(iter_sitemap_files())
+    return iter_urlset(row for section in SECTIONS for row in _iter_rows(section))
+
+
+def iter_section(section, start):
+    return iter_urlset(_iter_rows(section, start, SITEMAP_MAX_URLS))
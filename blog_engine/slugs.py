@@ -0,0 +1,105 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+# keeps the OR of prefix lookups well under SQLite's expression depth limit
+LOOKUP_CHUNK_SIZE = 100
+ALLOCATION_ATTEMPTS = 5
+# room left for a -N suffix so suffixed slugs always keep the full base
+SUFFIX_RESERVE = 7
+
+
+def base_slug(model, title, field='slug'):
+    max_length = model._meta.get_field(field).max_length
+    return (slugify(title) or model._meta.model_name)[:max_length - SUFFIX_RESERVE].strip('-')
+
+
+def _with_suffix(base, number, max_length):
+    suffix = '-%d' % number
+    return base[:max_length - len(suffix)].rstrip('-') + suffix
+
+
+def allocate_slug(model, title, field='slug'):
+    """
+    Return a free slug for title with a single query
+
+    The query fetches at most two rows: the bare slug if it is taken and the
+    base-N slug with the largest N, found through the prefix index.
+    """
+    max_length = model._meta.get_field(field).max_length
+    base = base_slug(model, title, field)
+    rows = list(model._default_manager.filter(
+        Q(**{field: base}) |
+        Q(**{field + '__startswith': base + '-', field + '__regex': r'^%s-[0-9]+$' % re.escape(base)})
+    ).annotate(
+        is_base=Case(When(**{field: base, 'then': Value(1)}), default=Value(0), output_field=IntegerField()),
+        slug_length=Length(field),
+    ).order_by('-is_base', '-slug_length', '-' + field).values_list(field, flat=True)[:2])
+    if not rows or rows[0] != base:
+        return base
+    if len(rows) == 1:
+        return _with_suffix(base, 2, max_length)
+    return _with_suffix(base, int(rows[1].rpartition('-')[2]) + 1, max_length)
+
+
+def save_with_unique_slug(instance, save, field='slug', source='title'):
+    """
+    Allocate a slug and save, re-allocating if a concurrent writer took it first
+
+    Each attempt runs in a savepoint so a unique violation does not break an
+    outer transaction.
+    """
+    for attempt in range(ALLOCATION_ATTEMPTS):
+        setattr(instance, field, allocate_slug(type(instance), getattr(instance, source), field))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if attempt == ALLOCATION_ATTEMPTS - 1:
+                raise
+
+
+def _taken_suffixes(model, bases, field):
+    """
+    Map every base to the numeric suffixes already used by base-N slugs, -1 for the bare base
+    """
+    taken = {base: set() for base in bases}
+    bases = sorted(bases)
+    for i in range(0, len(bases), LOOKUP_CHUNK_SIZE):
+        chunk = bases[i:i + LOOKUP_CHUNK_SIZE]
+        condition = reduce(or_, (
+            Q(**{field: base}) | Q(**{field + '__startswith': base + '-'}) for base in chunk
+        ))
+        for slug in model._default_manager.filter(condition).values_list(field, flat=True):
+            if slug in taken:
+                taken[slug].add(-1)
+            base, _, suffix = slug.rpartition('-')
+            if base in taken and suffix.isdigit():
+                taken[base].add(int(suffix))
+    return taken
+
+
+def allocate_slugs(model, titles, field='slug'):
+    """
+    Return a unique slug for each title, resolving collisions with the table
+    and within titles by appending the next free -N suffix
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [base_slug(model, title, field) for title in titles]
+    taken = _taken_suffixes(model, set(bases), field)
+    slugs = []
+    for base in bases:
+        used = taken[base]
+        if -1 not in used:
+            used.add(-1)
+            slugs.append(base)
+            continue
+        number = max(used | {1}) + 1
+        used.add(number)
+        slugs.append(_with_suffix(base, number, max_length))
+    return slugs
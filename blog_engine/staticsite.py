@@ -0,0 +1,269 @@
+import json
+import math
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import resolve, reverse
+
+STATE_FILE = '.static-export.json'
+# pages rendered per worker task
+TASK_SIZE = 200
+# keeps IN lists under SQLite's variable limit
+CHUNK_SIZE = 500
+PAGE_LINK_RE = re.compile(r'href="\?page=(\d+)"')
+
+
+def _views():
+    from . import views
+
+    # numbered pages only, cursors need a query string the static site cannot serve
+    return {
+        'posts_list': views.PostsList.as_view(cursor_pagination=False),
+        'post_detail': views.PostDetail.as_view(),
+        'tag_posts_list': views.TagPostList.as_view(cursor_pagination=False),
+        'tags_list': views.TagsList.as_view(),
+    }
+
+
+def page_path(path, page=1):
+    """
+    URL path of a numbered page of a list, /tag/python/page/2/ for page 2 of /tag/python/
+    """
+    return path if page == 1 else '%spage/%d/' % (path, page)
+
+
+def _file_for(output, path):
+    return os.path.join(output, path.lstrip('/'), 'index.html')
+
+
+def _make_request(path, page):
+    site = urlsplit(_site_url())
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict('page=%d' % page if page > 1 else '')
+    request.META['SERVER_NAME'] = site.hostname or 'localhost'
+    request.META['SERVER_PORT'] = str(site.port or (443 if site.scheme == 'https' else 80))
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(path)
+    return request
+
+
+def _site_url():
+    from .feeds import get_site_url
+
+    return get_site_url()
+
+
+def render_page(view, path, page=1):
+    """
+    Render one page through its view and templates as an anonymous reader, None for a 404
+    """
+    try:
+        response = view(_make_request(path, page), **resolve(path).kwargs)
+    except Http404:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code != 200:
+        return None
+    html = response.content.decode(response.charset)
+    return PAGE_LINK_RE.sub(lambda match: 'href="%s"' % page_path(path, int(match.group(1))), html)
+
+
+def render_pages(output, pages):
+    """
+    Worker task: render and write [(url name, path, page)], return the number written
+    """
+    views = _views()
+    written = 0
+    for url_name, path, page in pages:
+        html = render_page(views[url_name], path, page)
+        if html is None:
+            continue
+        filename = _file_for(output, page_path(path, page))
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # write then rename so the web server never serves a half written page
+        with open(filename + '.tmp', 'w', encoding='utf-8') as fp:
+            fp.write(html)
+        os.replace(filename + '.tmp', filename)
+        written += 1
+    return written
+
+
+def _init_worker():
+    import django
+
+    # a no-op for forked workers, spawned ones start without a configured Django
+    django.setup()
+
+
+def read_site_index(batch_size=1000):
+    """
+    Return ({slug: [date_pub timestamp, pk, tag slugs]}, {slug: updated_at timestamp}) of the published posts
+
+    Posts are read in keyset chunks without their bodies.
+    """
+    from .models import Post
+
+    index = {}
+    updated = {}
+    last_pk = 0
+    while True:
+        rows = list(Post.objects.published().filter(pk__gt=last_pk).order_by('pk').values_list(
+            'pk', 'slug', 'date_pub', 'updated_at'
+        )[:batch_size])
+        if not rows:
+            return index, updated
+        tags = {}
+        for post_id, slug in Post.tags.through.objects.filter(
+            post_id__in=[row[0] for row in rows]
+        ).order_by('tag__slug').values_list('post_id', 'tag__slug'):
+            tags.setdefault(post_id, []).append(slug)
+        for pk, slug, date_pub, updated_at in rows:
+            index[slug] = [date_pub.timestamp(), pk, tags.get(pk, [])]
+            updated[slug] = updated_at.timestamp()
+        last_pk = rows[-1][0]
+
+
+def _ordered(index, tag=None):
+    """
+    Slugs of a list newest first, like the views order them
+    """
+    slugs = [slug for slug, (_, _, tags) in index.items() if tag is None or tag in tags]
+    return sorted(slugs, key=lambda slug: (index[slug][0], index[slug][1]), reverse=True)
+
+
+def _page_count(count, per_page):
+    return max(1, math.ceil(count / per_page))
+
+
+def _changed_pages(old_list, new_list, edited, per_page):
+    """
+    Numbers of the pages of a list whose posts, or the content of one of them, changed
+    """
+    pages = []
+    for number in range(1, _page_count(len(new_list), per_page) + 1):
+        bottom = (number - 1) * per_page
+        new_slice = new_list[bottom:bottom + per_page]
+        if new_slice != old_list[bottom:bottom + per_page] or edited.intersection(new_slice):
+            pages.append(number)
+    return pages
+
+
+def _stale_pages(path, old_count, new_count, per_page):
+    return [
+        page_path(path, number)
+        for number in range(_page_count(new_count, per_page) + 1, _page_count(old_count, per_page) + 1)
+    ]
+
+
+def plan_export(old_state, index, updated, tags, per_page, tag_per_page):
+    """
+    Return (pages to render, paths to delete) to bring an export from old_state to index
+
+    Without an old state everything is rendered. Otherwise only the detail
+    pages of new and edited posts, the detail pages listing them as related,
+    and the list pages whose posts changed are. The aside tag cloud of the
+    pages left alone is refreshed by the next full export.
+    """
+    from .models import RelatedPost
+
+    old_index = old_state.get('posts', {}) if old_state else {}
+    exported_at = old_state.get('exported_at', 0) if old_state else 0
+    full = not old_state
+    edited = {slug for slug, timestamp in updated.items() if timestamp > exported_at or slug not in old_index}
+    changed = edited | {slug for slug in index if old_index.get(slug) != index[slug]}
+    removed = set(old_index) - set(index)
+
+    pages = []
+    detail_slugs = set(index) if full else set(changed)
+    if not full and (changed or removed):
+        # related posts show the titles of other posts
+        related_ids = [index[slug][1] for slug in edited] + [old_index[slug][1] for slug in removed]
+        for i in range(0, len(related_ids), CHUNK_SIZE):
+            detail_slugs.update(
+                slug for slug in RelatedPost.objects.filter(
+                    related_id__in=related_ids[i:i + CHUNK_SIZE]
+                ).values_list('post__slug', flat=True) if slug in index
+            )
+    pages.extend(('post_detail', reverse('post_detail', kwargs={'slug': slug}), 1) for slug in sorted(detail_slugs))
+    deleted = [reverse('post_detail', kwargs={'slug': slug}) for slug in sorted(removed)]
+
+    home = reverse('posts_list')
+    old_list, new_list = _ordered(old_index), _ordered(index)
+    numbers = range(1, _page_count(len(new_list), per_page) + 1) if full else _changed_pages(
+        old_list, new_list, edited, per_page
+    )
+    pages.extend(('posts_list', home, number) for number in numbers)
+    deleted.extend(_stale_pages(home, len(old_list), len(new_list), per_page))
+
+    old_tags = set(old_state.get('tags', [])) if old_state else set()
+    new_tags = set(tags)
+    for tag in sorted(old_tags | new_tags):
+        path = reverse('tag_posts_list', kwargs={'slug': tag})
+        old_list, new_list = _ordered(old_index, tag), _ordered(index, tag)
+        if tag not in new_tags:
+            deleted.append(path)
+            continue
+        numbers = range(1, _page_count(len(new_list), tag_per_page) + 1) if full else _changed_pages(
+            old_list, new_list, edited, tag_per_page
+        )
+        pages.extend(('tag_posts_list', path, number) for number in numbers)
+        deleted.extend(_stale_pages(path, len(old_list), len(new_list), tag_per_page))
+
+    if full or old_tags != new_tags or changed or removed:
+        pages.append(('tags_list', reverse('tags_list'), 1))
+    return pages, deleted
+
+
+def load_state(output):
+    try:
+        with open(os.path.join(output, STATE_FILE), encoding='utf-8') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def export_site(output, workers=None, full=False, batch_size=1000):
+    """
+    Render the public pages to output/<path>/index.html, return (written, deleted)
+
+    Pages are rendered by a pool of worker processes, TASK_SIZE pages per
+    task, or in this process with workers=1. Unless full is set, only the
+    pages affected by posts changed since the last export are rewritten.
+    """
+    from . import views
+    from .models import Tag
+
+    started = time.time()
+    old_state = None if full else load_state(output)
+    index, updated = read_site_index(batch_size)
+    tags = list(Tag.objects.order_by('slug').values_list('slug', flat=True))
+    pages, deleted = plan_export(
+        old_state, index, updated, tags, views.PostsList.paginate_by, views.TagPostList.paginate_by
+    )
+
+    for path in deleted:
+        shutil.rmtree(os.path.join(output, path.lstrip('/')), ignore_errors=True)
+
+    tasks = [pages[i:i + TASK_SIZE] for i in range(0, len(pages), TASK_SIZE)]
+    if workers == 1 or len(tasks) <= 1:
+        written = sum(render_pages(output, task) for task in tasks)
+    else:
+        # forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            written = sum(executor.map(render_pages, [output] * len(tasks), tasks))
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, STATE_FILE), 'w', encoding='utf-8') as fp:
+        json.dump({'exported_at': started, 'posts': index, 'tags': tags}, fp)
+    return written, len(deleted)
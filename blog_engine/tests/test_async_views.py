@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import path
+
+from .. import urls, views
+from ..models import Post, Tag
+
+ASYNC_VIEWS = {
+    'posts_list': views.AsyncPostsList,
+    'post_detail': views.AsyncPostDetail,
+    'tags_list': views.AsyncTagsList,
+    'tag_posts_list': views.AsyncTagPostList,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(), name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadViewsTest(TransactionTestCase):
+    """
+    The async views query from worker threads with their own connections, so
+    the data has to be committed. Query strings and headers are passed the way
+    the ASGI scope carries them, AsyncClient of Django 3.2 drops the others.
+    """
+    def setUp(self) -> None:
+        cache.clear()
+        self.tag = Tag.objects.create(title='python')
+        self.posts = [Post.objects.create(title='post %d' % i, body='body %d' % i) for i in range(6)]
+        for post in self.posts[:3]:
+            post.tags.add(self.tag)
+
+    async def test_posts_list(self):
+        response = await self.async_client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post.title for post in response.context['posts']], ['post 5', 'post 4', 'post 3', 'post 2'])
+        self.assertEqual(response.context['paginator'].count, 6)
+        self.assertIn('#python', response.context['tag_cloud'])
+
+        response = await self.async_client.get('/?page=2')
+        self.assertEqual([post.title for post in response.context['posts']], ['post 1', 'post 0'])
+        response = await self.async_client.get('/?page=last')
+        self.assertEqual(response.context['page_obj'].number, 2)
+        response = await self.async_client.get('/?page=3')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_search(self):
+        response = await self.async_client.get('/?q=body')
+        self.assertEqual(response.context['search_query'], 'body')
+        self.assertEqual(response.context['paginator'].count, 6)
+
+    @override_settings(BLOG_CURSOR_PAGINATION=True)
+    async def test_cursor_pagination(self):
+        response = await self.async_client.get('/')
+        page = response.context['page_obj']
+        response = await self.async_client.get('/?cursor=%s' % page.next_cursor)
+        self.assertEqual([post.title for post in response.context['posts']], ['post 1', 'post 0'])
+
+    async def test_post_detail(self):
+        response = await self.async_client.get(self.posts[0].get_absolute_url())
+        self.assertEqual(response.context['post'], self.posts[0])
+        self.assertEqual(len(response.context['related_posts']), 2)
+        etag = response['ETag']
+        response = await self.async_client.get(self.posts[0].get_absolute_url(), **{'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get('/post/missing/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_tag_pages(self):
+        response = await self.async_client.get(self.tag.get_absolute_url())
+        self.assertEqual(response.context['tag'], self.tag)
+        self.assertEqual([post.title for post in response.context['posts']], ['post 2', 'post 1', 'post 0'])
+        response = await self.async_client.get('/tag/missing/')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/tags/')
+        self.assertEqual(list(response.context['tags']), [self.tag])
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    async def test_middleware_in_async_stack(self):
+        response = await self.async_client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+        response = await self.async_client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    async def test_no_server_timing_for_readers(self):
+        response = await self.async_client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    async def test_other_methods(self):
+        for path in ('/', self.posts[0].get_absolute_url(), '/tags/', self.tag.get_absolute_url()):
+            response = await self.async_client.post(path)
+            self.assertEqual(response.status_code, 405, path)
+            response = await self.async_client.options(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIn('GET', response['Allow'])
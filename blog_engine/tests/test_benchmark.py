@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.urls import get_resolver
+
+from ..benchmark import compare, get_routes, percentile, run_benchmark, run_load, search_term, seed_data
+from ..models import Media, Post, Revision, Tag
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        # seed_data attaches a file to a post
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, BLOG_MEDIA_VARIANT_ROOT=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        seed_data(posts=30, tags=8, tags_per_post=2, batch_size=10)
+
+    def test_seed_data(self):
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertLessEqual(Tag.objects.count(), 8)
+        popular = list(Tag.objects.popular().values_list('post_count', flat=True))
+        self.assertGreater(popular[0], popular[-1])
+        self.assertTrue(Post.objects.filter(body__contains=search_term()).exists())
+
+    def test_routes_cover_every_url(self):
+        url_names = {pattern.name for pattern in get_resolver('blog_engine.urls').url_patterns}
+        self.assertEqual({route.url_name for route in get_routes()}, url_names)
+
+    def test_routes_do_not_write(self):
+        Revision.objects.all().delete()
+        Media.objects.all().delete()
+        labels = {route.label for route in get_routes()}
+        self.assertNotIn('post_history', labels)
+        self.assertNotIn('media_file', labels)
+        self.assertFalse(Revision.objects.exists())
+        self.assertFalse(Media.objects.exists())
+
+    def test_run_benchmark(self):
+        report = run_benchmark(get_routes(), iterations=2, warmup=0)
+        self.assertEqual(report['meta']['posts'], 30)
+        for label, result in report['routes'].items():
+            self.assertEqual(result['status'], 200, label)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertEqual(report['routes']['post_detail']['queries'], 3)
+        self.assertEqual(list(compare(report, report)), [
+            (label, result['p95_ms'], result['p95_ms'], result['queries'], result['queries'], False)
+            for label, result in report['routes'].items()
+        ])
+
+    def test_cold_runs_keep_other_cache_keys(self):
+        routes = [route for route in get_routes() if route.label == 'posts_list']
+        cache.set('sessions:other-app', 'kept', None)
+        report = run_benchmark(routes, iterations=2, warmup=0)
+        self.assertEqual(report['routes']['posts_list']['status'], 200)
+        self.assertEqual(cache.get('sessions:other-app'), 'kept')
+        run_benchmark(routes, iterations=1, warmup=0, clear_caches=True)
+        self.assertIsNone(cache.get('sessions:other-app'))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([3], 95), 3)
+
+
+class LoadBenchmarkTest(LiveServerTestCase):
+    def test_run_load(self):
+        Post.objects.create(title='post', body='body')
+        report = run_load(self.live_server_url, ['/', '/tags/'], concurrency=2, duration=0.3)
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual(report['errors'], 0)
+        self.assertLessEqual(report['p50_ms'], report['p95_ms'])
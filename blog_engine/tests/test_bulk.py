@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..bulk import export_posts, import_posts, parse_front_matter
+from ..models import Post, SearchIndexEntry, Tag
+
+
+class BulkImportTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        Post.objects.create(title='Hello')
+        Tag.objects.create(title='python')
+
+    def test_import_jsonl_command(self):
+        path = os.path.join(self.tmp, 'posts.jsonl')
+        with open(path, 'w') as fp:
+            for i in range(5):
+                fp.write(json.dumps({'title': 'Hello', 'body': '# body %d' % i, 'tags': ['python', 'django']}) + '\n')
+        call_command('import_posts', path, batch_size=2, stdout=StringIO())
+        slugs = set(Post.objects.values_list('slug', flat=True))
+        self.assertEqual(slugs, {'hello', 'hello-2', 'hello-3', 'hello-4', 'hello-5', 'hello-6'})
+        self.assertEqual(Tag.objects.get(slug='python').post_count, 5)
+        self.assertEqual(Tag.objects.get(slug='django').post_count, 5)
+        post = Post.objects.get(slug='hello-6')
+        self.assertEqual(post.body_html, '<h1>body 4</h1>')
+        self.assertTrue(SearchIndexEntry.objects.filter(post=post, term='body').exists())
+
+    def test_import_batch_query_count_is_constant(self):
+        records = [{'title': 'post %d' % i, 'body': 'b', 'tags': ['t%d' % (i % 3)]} for i in range(50)]
+        with self.assertNumQueries(28):
+            import_posts(records, batch_size=50)
+
+    def test_import_markdown_with_front_matter(self):
+        with open(os.path.join(self.tmp, 'first.md'), 'w') as fp:
+            fp.write('---\ntitle: First\ndate_pub: 2019-05-01T10:00:00+00:00\ntags: [python, orm]\n---\nSome *text*\n')
+        call_command('import_posts', self.tmp, format='markdown', stdout=StringIO())
+        post = Post.objects.get(slug='first')
+        self.assertEqual(post.body, 'Some *text*\n')
+        self.assertEqual(post.date_pub.year, 2019)
+        self.assertEqual(set(post.tags.values_list('slug', flat=True)), {'python', 'orm'})
+
+    def test_parse_front_matter_without_header(self):
+        self.assertEqual(parse_front_matter('just text'), ({}, 'just text'))
+
+
+class BulkExportTest(TestCase):
+    def test_export_round_trip(self):
+        tag = Tag.objects.create(title='python')
+        for i in range(5):
+            Post.objects.create(title='post %d' % i, body='body %d' % i).tags.add(tag)
+        records = list(export_posts(batch_size=2))
+        self.assertEqual([record['slug'] for record in records], ['post-%d' % i for i in range(5)])
+        self.assertEqual(records[0]['tags'], ['python'])
+
+        out = StringIO()
+        call_command('export_posts', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        Post.objects.all().delete()
+        import_posts(json.loads(line) for line in lines)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Tag.objects.get().post_count, 5)
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..caching import get_tag_cloud
+from ..models import Post, Tag
+
+
+class TagCloudCacheTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.tag = Tag.objects.create(title='python')
+        self.post = Post.objects.create(title='post', body='body')
+        self.post.tags.add(self.tag)
+
+    def test_tag_cloud_is_cached(self):
+        get_tag_cloud()
+        with self.assertNumQueries(0):
+            self.assertIn('#python', get_tag_cloud())
+
+    def test_tag_change_invalidates_cloud(self):
+        get_tag_cloud()
+        self.tag.title = 'django'
+        self.tag.save()
+        self.assertIn('#django', get_tag_cloud())
+        Tag.objects.create(title='flask')
+        self.assertIn('#flask', get_tag_cloud())
+
+    def test_post_tags_change_updates_counts(self):
+        self.assertIn('<small class="text-muted">1</small>', get_tag_cloud())
+        self.post.tags.clear()
+        self.assertIn('<small class="text-muted">0</small>', get_tag_cloud())
+        self.post.tags.add(self.tag)
+        self.post.delete()
+        self.assertIn('<small class="text-muted">0</small>', get_tag_cloud())
+
+
+class AnonymousPageCacheMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.tag = Tag.objects.create(title='python')
+        self.post = Post.objects.create(title='post', body='body')
+        self.post.tags.add(self.tag)
+        self.other = Post.objects.create(title='other', body='other body')
+
+    def test_anonymous_pages_are_cached(self):
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_query_string_is_part_of_key(self):
+        self.client.get('/')
+        response = self.client.get('/', {'q': 'body'})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_authenticated_users_bypass_cache(self):
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin')
+        self.client.get('/')
+        self.client.login(username='admin', password='admin')
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_post_edit_purges_only_affected_pages(self):
+        for url in ('/', self.post.get_absolute_url(), self.tag.get_absolute_url(), self.other.get_absolute_url()):
+            self.client.get(url)
+        self.post.body = 'edited'
+        self.post.save()
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.post.get_absolute_url())['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.tag.get_absolute_url())['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.other.get_absolute_url())['X-Page-Cache'], 'HIT')
+
+    def test_tag_change_purges_all_pages(self):
+        self.client.get(self.other.get_absolute_url())
+        Tag.objects.create(title='django')
+        self.assertEqual(self.client.get(self.other.get_absolute_url())['X-Page-Cache'], 'MISS')
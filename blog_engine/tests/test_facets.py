@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..caching import get_tag_cloud
+from ..facets import filter_by_tags, get_facets
+from ..models import Post, Tag
+
+
+class FacetsTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.python = Tag.objects.create(title='python')
+        self.django = Tag.objects.create(title='django')
+        self.flask = Tag.objects.create(title='flask')
+        self.both = Post.objects.create(title='both', body='querysets and views')
+        self.both.tags.set([self.python, self.django])
+        self.all = Post.objects.create(title='all', body='views everywhere')
+        self.all.tags.set([self.python, self.django, self.flask])
+        self.python_only = Post.objects.create(title='python only', body='views')
+        self.python_only.tags.set([self.python])
+
+    def test_filter_by_tags_intersects(self):
+        posts = filter_by_tags(Post.objects.all(), [self.python.pk, self.django.pk])
+        self.assertEqual(set(posts), {self.both, self.all})
+        posts = filter_by_tags(Post.objects.all(), [self.python.pk, self.django.pk, self.flask.pk])
+        self.assertEqual(list(posts), [self.all])
+        self.assertEqual(filter_by_tags(Post.objects.all(), []).count(), 3)
+
+    def test_facets_count_remaining_tags(self):
+        posts = filter_by_tags(Post.objects.all(), [self.python.pk])
+        facets = get_facets(posts, [self.python.pk])
+        self.assertEqual(facets, [
+            {'slug': 'django', 'title': 'django', 'count': 2},
+            {'slug': 'flask', 'title': 'flask', 'count': 1},
+        ])
+
+    def test_browse_view(self):
+        response = self.client.get(reverse('browse'), {'tag': ['python', 'django']})
+        self.assertEqual({post.title for post in response.context['posts']}, {'both', 'all'})
+        self.assertEqual(response.context['facets'], [
+            {'slug': 'flask', 'title': 'flask', 'count': 1, 'url': '/browse/?tag=django&tag=flask&tag=python'},
+        ])
+        self.assertEqual(
+            [tag.remove_url for tag in response.context['selected_tags']],
+            ['/browse/?tag=python', '/browse/?tag=django'],
+        )
+
+    def test_browse_view_with_search(self):
+        response = self.client.get(reverse('browse'), {'tag': 'python', 'q': 'querysets'})
+        self.assertEqual([post.title for post in response.context['posts']], ['both'])
+        self.assertContains(response, '<mark>querysets</mark>', html=False)
+        self.assertEqual([facet['slug'] for facet in response.context['facets']], ['django'])
+
+    def test_browse_unknown_tag(self):
+        self.assertEqual(self.client.get(reverse('browse'), {'tag': 'nope'}).status_code, 404)
+
+    def test_browse_query_budget(self):
+        get_tag_cloud()
+        with self.assertNumQueries(6):
+            self.client.get(reverse('browse'), {'tag': ['python', 'django']})
@@ -0,0 +1,73 @@
+import json
+from datetime import timedelta
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import FeedItem, Post, Tag
+
+
+class FeedViewTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.tag = Tag.objects.create(title='python')
+        self.post1 = Post.objects.create(title='first', body='# one')
+        self.post1.tags.add(self.tag)
+        self.post2 = Post.objects.create(title='second <b>', body='two')
+
+    def test_feed_items_are_stored_on_save(self):
+        item = FeedItem.objects.get(post=self.post1)
+        self.assertIn('<category term="python"', item.atom)
+        self.assertIn('&lt;h1&gt;one&lt;/h1&gt;', item.rss)
+
+    def test_atom_and_rss_feeds_are_valid_xml(self):
+        for fmt in ('atom', 'rss'):
+            response = self.client.get(reverse('feed', kwargs={'fmt': fmt}))
+            self.assertEqual(response.status_code, 200)
+            root = ElementTree.fromstring(response.content)
+            titles = [el.text for el in root.iter() if el.tag.endswith('title')]
+            self.assertIn('second <b>', titles)
+            self.assertIn('first', titles)
+
+    def test_json_feed(self):
+        response = self.client.get(reverse('feed', kwargs={'fmt': 'json'}))
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['title'] for item in data['items']], ['second <b>', 'first'])
+
+    def test_tag_feed(self):
+        response = self.client.get(reverse('tag_feed', kwargs={'slug': 'python', 'fmt': 'json'}))
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['title'] for item in data['items']], ['first'])
+
+    def test_cached_feed_is_served_without_rendering(self):
+        url = reverse('feed', kwargs={'fmt': 'atom'})
+        self.client.get(url)
+        with mock.patch('blog_engine.views.build_feed') as build_feed:
+            response = self.client.get(url)
+        build_feed.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_etag(self):
+        url = reverse('feed', kwargs={'fmt': 'rss'})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.post2.body = 'edited'
+        self.post2.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_since_returns_only_updated_posts(self):
+        since = timezone.now()
+        Post.objects.filter(pk=self.post1.pk).update(updated_at=since - timedelta(days=1))
+        FeedItem.objects.filter(pk=self.post1.pk).update(updated_at=since - timedelta(days=1))
+        FeedItem.objects.filter(pk=self.post2.pk).update(updated_at=since + timedelta(seconds=1))
+        response = self.client.get(reverse('feed', kwargs={'fmt': 'json'}), {'since': since.isoformat()})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['title'] for item in data['items']], ['second <b>'])
+
+    def test_invalid_since_and_format(self):
+        self.assertEqual(self.client.get(reverse('feed', kwargs={'fmt': 'json'}), {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('feed', kwargs={'fmt': 'csv'})).status_code, 404)
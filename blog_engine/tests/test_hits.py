@@ -0,0 +1,112 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import hits
+from ..hits import ViewCounter, add_views, counter, flush_views, get_decayed_views
+from ..models import Post, PostStats
+
+
+@override_settings(BLOG_POPULARITY_HALF_LIFE=60 * 60)
+class PopularityTest(TestCase):
+    def setUp(self) -> None:
+        self.now = timezone.now()
+
+    def test_views_decay(self):
+        popularity = add_views(None, 4, self.now)
+        self.assertAlmostEqual(get_decayed_views(popularity, self.now), 4)
+        self.assertAlmostEqual(get_decayed_views(popularity, self.now + timedelta(hours=2)), 1)
+        popularity = add_views(popularity, 2, self.now + timedelta(hours=1))
+        self.assertAlmostEqual(get_decayed_views(popularity, self.now + timedelta(hours=1)), 4)
+        self.assertEqual(get_decayed_views(None), 0)
+
+    def test_flush_adds_to_stored_counts(self):
+        first = Post.objects.create(title='first', body='body')
+        second = Post.objects.create(title='second', body='body')
+        self.assertEqual(flush_views({first.slug: 3, 'missing': 1}, self.now), 1)
+        self.assertEqual(flush_views({first.slug: 2, second.slug: 1}, self.now), 2)
+        stats = {row.post_id: row for row in PostStats.objects.all()}
+        self.assertEqual(stats[first.pk].views, 5)
+        self.assertEqual(stats[second.pk].views, 1)
+        self.assertAlmostEqual(stats[first.pk].get_score(self.now), 5)
+
+    def test_recent_views_rank_higher(self):
+        old = Post.objects.create(title='old favourite', body='body')
+        new = Post.objects.create(title='new favourite', body='body')
+        flush_views({old.slug: 10}, self.now - timedelta(hours=4))
+        flush_views({new.slug: 2}, self.now)
+        self.assertEqual(
+            list(PostStats.objects.order_by('-popularity').values_list('post_id', flat=True)), [new.pk, old.pk]
+        )
+
+
+class ViewCounterTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        counter.take()
+        self.post = Post.objects.create(title='post', body='body')
+        self.draft = Post.objects.create(title='draft', body='body', status=Post.DRAFT)
+
+    def test_views_are_buffered(self):
+        for _ in range(3):
+            self.client.get(self.post.get_absolute_url())
+        self.client.get(self.draft.get_absolute_url())
+        self.client.get(reverse('posts_list'))
+        # the second and third views come from the page cache
+        self.assertEqual(counter.counts, {self.post.slug: 3})
+        self.assertFalse(PostStats.objects.exists())
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(PostStats.objects.get().views, 3)
+        self.assertEqual(counter.flush(), 0)
+
+    @override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+    def test_flush_after_interval(self):
+        self.client.get(self.post.get_absolute_url())
+        self.assertEqual(PostStats.objects.get().views, 1)
+        self.assertEqual(counter.counts, {})
+
+    def test_most_read_list(self):
+        other = Post.objects.create(title='other', body='body')
+        flush_views({self.post.slug: 1, other.slug: 5, self.draft.slug: 10})
+        response = self.client.get(reverse('popular_posts'))
+        self.assertEqual([post.title for post in response.context['posts']], ['other', 'post'])
+        self.assertContains(response, '5 views')
+        # flushes purge the cached list
+        flush_views({self.post.slug: 10})
+        response = self.client.get(reverse('popular_posts'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual([post.title for post in response.context['posts']], ['post', 'other'])
+
+
+class ViewCounterShutdownTest(TransactionTestCase):
+    def setUp(self) -> None:
+        self.post = Post.objects.create(title='post', body='body')
+        self.views = ViewCounter()
+
+    def test_stop_flushes_buffered_views(self):
+        self.views.add(self.post.slug)
+        self.views.add(self.post.slug)
+        self.views.stop()
+        self.assertEqual(PostStats.objects.get().views, 2)
+        self.assertEqual(self.views.counts, {})
+
+    @override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0.05)
+    def test_idle_buffer_is_flushed_in_the_background(self):
+        with mock.patch.object(hits.atexit, 'register') as register, mock.patch.object(hits.os, 'register_at_fork'):
+            self.views.start()
+            self.views.start()
+        self.addCleanup(self.views.stop)
+        register.assert_called_once_with(self.views.stop)
+        self.views.add(self.post.slug)
+        deadline = time.monotonic() + 5
+        while self.views.counts and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # let the write finish before reading
+        self.views.stopped.set()
+        self.views.thread.join()
+        self.assertEqual(PostStats.objects.get().views, 1)
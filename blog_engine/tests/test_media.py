@@ -0,0 +1,124 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..forms import PostCreateForm
+from ..media import Image, attach_media, file_name, get_variant_root
+from ..models import Media, Post
+
+
+def make_image(width, height, name='photo.jpg', image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class MediaTestCase(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, BLOG_MEDIA_VARIANT_ROOT=None, BLOG_MEDIA_VARIANT_WIDTHS=[320, 640, 1280]
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.post = Post.objects.create(title='post', body='body')
+
+
+class AttachmentTest(MediaTestCase):
+    def test_upload_through_post_form(self):
+        staff = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse('post_update', kwargs={'slug': self.post.slug}), {
+            'title': 'post', 'body': 'body',
+            'attachments': [SimpleUploadedFile('notes.txt', b'notes'), SimpleUploadedFile('slides.pdf', b'%PDF')],
+        })
+        self.assertRedirects(response, reverse('post_update', kwargs={'slug': self.post.slug}))
+        media = self.post.media.get(name='notes.txt')
+        self.assertEqual(media.size, 5)
+        self.assertEqual(media.content_type, 'text/plain')
+        self.assertFalse(media.is_image)
+        self.assertEqual(media.markdown, '[notes.txt](%s)' % media.get_absolute_url())
+        self.assertContains(self.client.get(response.url), media.markdown)
+
+    def test_files_are_served_as_downloads(self):
+        media = attach_media(self.post, SimpleUploadedFile('page.html', b'<script>alert(1)</script>'))
+        response = self.client.get(media.get_absolute_url())
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="page.html"')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(b''.join(response.streaming_content), b'<script>alert(1)</script>')
+
+    def test_unknown_files(self):
+        self.assertEqual(self.client.get(reverse('media_file', kwargs={'name': 'nothing.jpg'})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('media_file', kwargs={'name': '0' * 16})).status_code, 404)
+
+    def test_deleted_post_removes_files(self):
+        media = attach_media(self.post, SimpleUploadedFile('notes.txt', b'notes'))
+        path = media.file.path
+        self.post.delete()
+        self.assertFalse(Media.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_upload_size_limit(self):
+        with self.settings(BLOG_MEDIA_MAX_UPLOAD_SIZE=4):
+            form = PostCreateForm(
+                data={'title': 'post', 'body': 'body'},
+                files={'attachments': SimpleUploadedFile('notes.txt', b'notes')},
+            )
+            self.assertFalse(form.is_valid())
+            self.assertIn('attachments', form.errors)
+
+
+@skipIf(Image is None, 'Pillow is not installed')
+class ImageVariantTest(MediaTestCase):
+    def test_image_dimensions(self):
+        media = attach_media(self.post, make_image(1600, 1000))
+        self.assertEqual((media.width, media.height), (1600, 1000))
+        self.assertEqual(media.get_variant_widths(), [320, 640, 1280])
+        self.assertEqual(attach_media(self.post, make_image(400, 300)).get_variant_widths(), [320, 400])
+        self.assertEqual(attach_media(self.post, make_image(400, 300, 'anim.gif', 'GIF')).get_variant_widths(), [])
+
+    def test_invalid_image_is_rejected(self):
+        form = PostCreateForm(
+            data={'title': 'post', 'body': 'body'},
+            files={'attachments': SimpleUploadedFile('photo.jpg', b'not an image')},
+        )
+        self.assertFalse(form.is_valid())
+
+    def test_markdown_references_variants(self):
+        media = attach_media(self.post, make_image(1600, 1000))
+        self.post.body = 'Look:\n\n%s' % media.markdown
+        self.post.save()
+        variant = reverse('media_file', kwargs={'name': file_name(media.content_hash, '.jpg', 640)})
+        self.assertIn('%s 640w' % variant, self.post.body_html)
+        self.assertIn('width="1600"', self.post.body_html)
+        self.assertIn('height="1000"', self.post.body_html)
+        self.assertIn('loading="lazy"', self.post.body_html)
+        # other images are left alone
+        self.post.body = '![elsewhere](https://example.com/photo.jpg)'
+        self.post.save()
+        self.assertNotIn('srcset', self.post.body_html)
+
+    def test_variants_are_made_on_first_request(self):
+        media = attach_media(self.post, make_image(1600, 1000))
+        name = file_name(media.content_hash, '.jpg', 320)
+        path = os.path.join(get_variant_root(), name)
+        self.assertFalse(os.path.exists(path))
+        url = reverse('media_file', kwargs={'name': name})
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (320, 200))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url.replace('-320w', '-321w')).status_code, 404)
+        media.delete()
+        self.assertFalse(os.path.exists(path))
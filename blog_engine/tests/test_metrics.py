@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..caching import get_page_cache, get_page_cache_key
+from ..metrics import registry
+from ..models import Post
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        registry.reset()
+        self.post = Post.objects.create(title='post', body='*body*')
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(self.post.get_absolute_url())
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'md;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_server_timing_only_for_staff(self):
+        url = self.post.get_absolute_url()
+        self.assertFalse(self.client.get(url).has_header('Server-Timing'))
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertIn('total;dur=', self.client.get(url)['Server-Timing'])
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    def test_cached_pages_do_not_keep_server_timing(self):
+        url = self.post.get_absolute_url()
+        self.client.get(url)
+        self.assertFalse(get_page_cache().get(get_page_cache_key(RequestFactory().get(url))).has_header('Server-Timing'))
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    def test_metrics_are_aggregated_per_url_name(self):
+        self.client.get('/')
+        self.client.get(self.post.get_absolute_url())
+        # the second request is served by the page cache
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+        content = self.client.get('/metrics/').content.decode()
+        self.assertIn('blog_request_duration_seconds_count{view="post_detail"} 2', content)
+        self.assertIn('blog_request_duration_seconds_count{view="posts_list"} 1', content)
+        self.assertIn('blog_request_duration_seconds_bucket{view="post_detail",le="+Inf"} 2', content)
+        self.assertIn('blog_db_queries_total{view="post_detail"}', content)
+        self.assertIn('blog_markdown_duration_seconds_total{view="post_detail"}', content)
+
+    def test_metrics_endpoint_is_restricted(self):
+        response = self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(BLOG_METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
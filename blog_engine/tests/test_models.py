@@ -1,4 +1,9 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
 
 from ..models import Post, Tag
 
@@ -26,3 +31,55 @@ class TestModels(TestCase):
     def test_model_str(self):
         self.assertEqual(str(self.post), 'Post1')
         self.assertEqual(str(self.tag1), 'python')
+
+    def test_post_save_renders_body_html(self):
+        self.post.body = '# Title'
+        self.post.save()
+        self.assertEqual(self.post.body_html, '<h1>Title</h1>')
+        self.assertEqual(self.post.get_body_as_markdown(), '<h1>Title</h1>')
+
+    def test_post_save_derives_plain_text_excerpt(self):
+        self.post.body = '# Intro\n\nSome **bold** words ' + ' '.join(['word'] * 30)
+        self.post.save()
+        self.assertTrue(self.post.excerpt.startswith('Intro Some bold words word'))
+        self.assertEqual(len(self.post.excerpt.split()), 15)
+        self.assertTrue(self.post.excerpt.endswith('…'))
+
+    @mock.patch('blog_engine.models.render_markdown')
+    def test_get_body_as_markdown_uses_stored_html(self, render_markdown):
+        self.post.get_body_as_markdown()
+        render_markdown.assert_not_called()
+
+    def test_render_markdown_command_rerenders_stale_posts(self):
+        Post.objects.filter(pk=self.post.pk).update(body_html='', body_hash='')
+        call_command('render_markdown', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.body_html, '<p>body of the post1</p>')
+
+    def test_tag_post_count_follows_m2m_changes(self):
+        other = Post.objects.create(title='Post2', slug='new_post2')
+        self.post.tags.add(self.tag1, self.tag2)
+        self.tag1.posts.add(other)
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.post_count, 2)
+        self.post.tags.remove(self.tag1)
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.post_count, 1)
+        self.post.tags.clear()
+        self.tag2.refresh_from_db()
+        self.assertEqual(self.tag2.post_count, 0)
+        other.delete()
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.post_count, 0)
+
+    def test_popular_tags(self):
+        self.post.tags.add(self.tag2)
+        self.assertEqual(list(Tag.objects.popular(1)), [self.tag2])
+
+    def test_reconcile_tag_counts_command(self):
+        self.post.tags.add(self.tag1)
+        Tag.objects.update(post_count=10)
+        self.assertEqual(self.client.get(reverse('tags_list'))['X-Page-Cache'], 'MISS')
+        call_command('reconcile_tag_counts', stdout=StringIO())
+        self.assertEqual(list(Tag.objects.order_by('title').values_list('post_count', flat=True)), [0, 1])
+        self.assertEqual(self.client.get(reverse('tags_list'))['X-Page-Cache'], 'MISS')
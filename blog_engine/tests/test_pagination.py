@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..pagination import CursorPaginator, InvalidCursor
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self) -> None:
+        self.posts = [Post.objects.create(title='post %d' % i) for i in range(7)]
+        # equal timestamps must still page deterministically by id
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[2:5]]).update(date_pub=timezone.now())
+        self.ordered = list(Post.objects.order_by('-date_pub', '-pk'))
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 3)
+        first = paginator.page()
+        self.assertEqual(first.object_list, self.ordered[:3])
+        self.assertFalse(first.has_previous())
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(second.object_list, self.ordered[3:6])
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(third.object_list, self.ordered[6:])
+        self.assertFalse(third.has_next())
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(back.object_list, self.ordered[3:6])
+        start = paginator.page(back.previous_cursor)
+        self.assertEqual(start.object_list, self.ordered[:3])
+        self.assertFalse(start.has_previous())
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            CursorPaginator(Post.objects.all(), 3).page('garbage')
+
+    @override_settings(BLOG_CURSOR_PAGINATION=True)
+    def test_posts_list_uses_cursor_pagination(self):
+        response = self.client.get(reverse('posts_list'))
+        self.assertEqual(list(response.context['posts']), self.ordered[:4])
+        self.assertContains(response, '?cursor=%s' % response.context['page_obj'].next_cursor)
+        response = self.client.get(reverse('posts_list'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(list(response.context['posts']), self.ordered[4:])
+        response = self.client.get(reverse('posts_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PageWindowTest(TestCase):
+    def setUp(self) -> None:
+        for i in range(40):
+            Post.objects.create(title='post %d' % i)
+
+    def test_window_around_current_page(self):
+        response = self.client.get(reverse('posts_list'), {'page': 5})
+        self.assertEqual(list(response.context['page_window']), [2, 3, 4, 5, 6, 7, 8])
+        self.assertContains(response, '?page=8')
+        self.assertNotContains(response, '?page=9"')
+        response = self.client.get(reverse('posts_list'), {'page': 'last'})
+        self.assertEqual(list(response.context['page_window']), [7, 8, 9, 10])
+        self.assertContains(response, '<li class="page-item disabled"><span class=\'page-link\'>Next</span></li>', html=True)
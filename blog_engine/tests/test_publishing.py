@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..caching import cap_timeout
+from ..forms import PostCreateForm
+from ..models import Post, Tag
+
+
+class PublishingTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.tag = Tag.objects.create(title='python')
+        self.published = Post.objects.create(title='published post', body='body')
+        self.draft = Post.objects.create(title='draft post', body='body', status=Post.DRAFT)
+        self.scheduled = Post.objects.create(
+            title='scheduled post', body='body', date_pub=timezone.now() + timedelta(hours=1)
+        )
+        for post in (self.published, self.draft, self.scheduled):
+            post.tags.add(self.tag)
+
+    def test_states(self):
+        self.assertEqual(self.published.state, 'published')
+        self.assertEqual(self.draft.state, 'draft')
+        self.assertEqual(self.scheduled.state, 'scheduled')
+        self.assertEqual(list(Post.objects.published()), [self.published])
+        self.assertEqual(list(Post.objects.scheduled()), [self.scheduled])
+
+    def test_anonymous_readers_only_see_published_posts(self):
+        response = self.client.get(reverse('posts_list'))
+        self.assertEqual([post.title for post in response.context['posts']], ['published post'])
+        response = self.client.get(self.tag.get_absolute_url())
+        self.assertEqual([post.title for post in response.context['posts']], ['published post'])
+        self.assertEqual(self.client.get(self.draft.get_absolute_url()).status_code, 404)
+        self.assertEqual(self.client.get(self.scheduled.get_absolute_url()).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('feed', kwargs={'fmt': 'json'})), 'scheduled post')
+        self.assertNotContains(self.client.get(reverse('sitemap')), self.draft.slug)
+
+    def test_staff_see_drafts_and_scheduled_posts(self):
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+        response = self.client.get(reverse('posts_list'))
+        self.assertEqual(len(response.context['posts']), 3)
+        self.assertContains(response, '<span class="badge badge-secondary">draft</span>', html=True)
+        self.assertEqual(self.client.get(self.draft.get_absolute_url()).status_code, 200)
+
+    def test_tag_counts_skip_drafts_and_scheduled_posts(self):
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.post_count, 1)
+        self.draft.status = Post.PUBLISHED
+        self.draft.save()
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.post_count, 2)
+
+    def test_tag_counts_include_scheduled_post_once_live(self):
+        self.assertEqual(self.client.get(reverse('tags_list')).context['tags'][0].post_count, 1)
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(reverse('tags_list'))
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.post_count, 2)
+        self.assertEqual(response.context['tags'][0].post_count, 2)
+
+    def test_caches_expire_when_scheduled_post_goes_live(self):
+        self.assertContains(self.client.get(reverse('posts_list')), 'published post')
+        self.assertEqual(self.client.get(reverse('posts_list'))['X-Page-Cache'], 'HIT')
+        self.assertNotContains(self.client.get(reverse('feed', kwargs={'fmt': 'json'})), 'scheduled post')
+        self.assertLessEqual(cap_timeout(60 * 60 * 24), 60 * 60)
+
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(reverse('posts_list'))
+            self.assertEqual(response['X-Page-Cache'], 'MISS')
+            self.assertContains(response, 'scheduled post')
+            self.assertContains(self.client.get(reverse('feed', kwargs={'fmt': 'json'})), 'scheduled post')
+            self.assertEqual(cap_timeout(60), 60)
+
+    def test_list_is_modified_when_scheduled_post_goes_live(self):
+        self.published.body = 'edited after scheduling'
+        self.published.save()
+        etag = self.client.get(reverse('posts_list'))['ETag']
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(reverse('posts_list'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'scheduled post')
+
+    def test_form_schedules_post(self):
+        publish_at = timezone.now() + timedelta(days=1)
+        form = PostCreateForm(data={
+            'title': 'later', 'body': 'body', 'status': Post.PUBLISHED,
+            'date_pub': publish_at.strftime('%Y-%m-%dT%H:%M'),
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().state, 'scheduled')
+
+    def test_form_edit_keeps_date_pub(self):
+        form = PostCreateForm(instance=self.published)
+        html = form['date_pub'].as_widget()
+        self.assertIn('step="1"', html)
+        data = {
+            'title': 'renamed', 'body': 'body', 'tags': [self.tag.pk], 'status': Post.PUBLISHED,
+            'date_pub': form['date_pub'].value().strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self.assertIn('value="%s"' % data['date_pub'], html)
+        form = PostCreateForm(data=data, instance=self.published)
+        self.assertTrue(form.is_valid(), form.errors)
+        date_pub = self.published.date_pub
+        form.save()
+        self.published.refresh_from_db()
+        self.assertEqual(self.published.date_pub, date_pub)
+
+    def test_form_keeps_defaults(self):
+        form = PostCreateForm(data={'title': 'now', 'body': 'body'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().state, 'published')
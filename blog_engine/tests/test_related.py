@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Post, RelatedPost, Tag
+from ..related import get_related_posts, rebuild_related_posts, score_posts
+
+
+class RelatedPostsTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.python, self.django, self.common = [Tag.objects.create(title=title) for title in ('python', 'django', 'common')]
+        self.first = Post.objects.create(title='first', body='body')
+        self.second = Post.objects.create(title='second', body='body')
+        self.third = Post.objects.create(title='third', body='body')
+        self.other = Post.objects.create(title='other', body='body')
+        for post in (self.first, self.second, self.third, self.other):
+            post.tags.add(self.common)
+        self.first.tags.add(self.python, self.django)
+        self.second.tags.add(self.python, self.django)
+        self.third.tags.add(self.python)
+
+    def related(self, post):
+        return [related.title for related in get_related_posts(post)]
+
+    def test_rare_shared_tags_rank_first(self):
+        self.assertEqual(self.related(self.first), ['second', 'third', 'other'])
+        self.assertEqual(set(self.related(self.third)[:2]), {'first', 'second'})
+        scores = score_posts([self.first.pk])[self.first.pk]
+        self.assertAlmostEqual(scores[self.second.pk], 1.0)
+        self.assertLess(scores[self.other.pk], scores[self.third.pk])
+
+    def test_tag_changes_refresh_other_posts(self):
+        self.other.tags.add(self.python, self.django)
+        self.assertEqual(set(self.related(self.other)[:2]), {'first', 'second'})
+        self.assertEqual(self.related(self.first)[:2], ['other', 'second'])
+        self.other.tags.clear()
+        self.assertEqual(self.related(self.other), [])
+        self.assertNotIn('other', self.related(self.first))
+
+    def test_deletes_update_lists(self):
+        self.second.delete()
+        self.assertEqual(self.related(self.first), ['third', 'other'])
+        self.python.delete()
+        self.assertEqual(self.related(self.third), ['other', 'first'])
+
+    def test_rebuild_matches_incremental(self):
+        stored = set(RelatedPost.objects.values_list('post_id', 'related_id'))
+        RelatedPost.objects.all().delete()
+        self.assertEqual(rebuild_related_posts(batch_size=2), 4)
+        self.assertEqual(set(RelatedPost.objects.values_list('post_id', 'related_id')), stored)
+
+    def test_detail_page_lists_related_posts(self):
+        response = self.client.get(self.first.get_absolute_url())
+        self.assertContains(response, 'Related posts')
+        self.assertContains(response, self.second.get_absolute_url())
+        self.assertEqual(response.context['related_posts'][0], self.second)
+
+    def test_related_post_changes_purge_listing_pages(self):
+        url = self.first.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        self.second.title = 'second renamed'
+        self.second.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'second renamed')
+        self.second.status = Post.DRAFT
+        self.second.save()
+        self.assertNotContains(self.client.get(url), self.second.get_absolute_url())
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, Revision
+from ..revisions import apply_delta, make_delta
+
+
+class RevisionTest(TestCase):
+    def setUp(self) -> None:
+        self.post = Post.objects.create(title='post', body='line 1\nline 2\nline 3\n')
+
+    def test_delta_round_trip(self):
+        old = 'a\nb\nc\nd\n'
+        new = 'a\nB\nc\nd\ne'
+        self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+        self.assertEqual(apply_delta(old, make_delta(old, '')), '')
+
+    def test_create_records_snapshot(self):
+        revision = self.post.revisions.get()
+        self.assertTrue(revision.is_snapshot)
+        self.assertEqual(revision.get_body(), self.post.body)
+
+    def test_unchanged_save_records_nothing(self):
+        self.post.save()
+        self.assertEqual(self.post.revisions.count(), 1)
+
+    @override_settings(BLOG_REVISION_SNAPSHOT_INTERVAL=5)
+    def test_every_version_is_rebuilt_from_a_bounded_chain(self):
+        lines = ['line %d\n' % i for i in range(200)]
+        post = Post.objects.create(title='long post', body=''.join(lines))
+        bodies = []
+        for i in range(12):
+            lines[i * 7] = 'edit %d\n' % i
+            post.body = ''.join(lines)
+            post.save()
+            bodies.append(post.body)
+        revisions = list(post.revisions.order_by('number'))
+        self.assertEqual(len(revisions), 13)
+        self.assertEqual([revision.number for revision in revisions if revision.is_snapshot], [1, 6, 11])
+        for revision, body in zip(revisions[1:], bodies):
+            with self.assertNumQueries(1):
+                self.assertEqual(revision.get_body(), body)
+        # diffs of small edits are much smaller than the body
+        self.assertLess(len(revisions[2].data), len(bodies[1]) / 10)
+
+    def test_posts_without_revisions_keep_their_stored_version(self):
+        Revision.objects.all().delete()
+        self.post.body = 'new body'
+        self.post.save()
+        first, second = self.post.revisions.order_by('number')
+        self.assertEqual(first.get_body(), 'line 1\nline 2\nline 3\n')
+        self.assertEqual(second.get_body(), 'new body')
+
+
+class RevisionViewsTest(TestCase):
+    def setUp(self) -> None:
+        self.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        self.user = User.objects.create_user('user', password='password')
+        self.post = Post.objects.create(title='post', body='old line\n')
+
+    def test_history_is_staff_only(self):
+        url = reverse('post_history', kwargs={'slug': self.post.slug})
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(url), '#1')
+
+    def test_update_records_author_and_diff(self):
+        self.client.force_login(self.staff)
+        self.client.post(reverse('post_update', kwargs={'slug': self.post.slug}), {
+            'title': 'post', 'body': 'new line\n',
+        })
+        revision = self.post.revisions.get(number=2)
+        self.assertEqual(revision.author, self.staff)
+        response = self.client.get(reverse('post_revision', kwargs={'slug': self.post.slug, 'number': 2}))
+        self.assertContains(response, '<span class="text-danger">-old line</span>', html=False)
+        self.assertContains(response, '<span class="text-success">+new line</span>', html=False)
+
+    def test_detail_links_history_for_staff(self):
+        url = reverse('post_history', kwargs={'slug': self.post.slug})
+        self.assertNotContains(self.client.get(self.post.get_absolute_url()), url)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(self.post.get_absolute_url()), url)
@@ -0,0 +1,79 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .. import routers
+from ..middleware import PRIMARY_COOKIE_NAME
+from ..models import Post, Tag
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_follow_the_request_routing(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+        token = routers.start_request()
+        try:
+            self.assertIsNone(self.router.db_for_read(Post))
+            routers.route_reads('replica')
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertFalse(routers.has_written())
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertTrue(routers.has_written())
+        finally:
+            routers.end_request(token)
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    @override_settings(BLOG_DATABASE_REPLICAS=['replica'])
+    def test_choose_replica(self):
+        self.assertEqual(routers.choose_replica(), 'replica')
+        with self.settings(BLOG_DATABASE_REPLICAS=[]):
+            self.assertIsNone(routers.choose_replica())
+
+
+class ReadYourWritesTest(TestCase):
+    def setUp(self) -> None:
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin')
+        self.client.login(username='admin', password='admin')
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.client.post('/tags/create/', {'title': 'python'})
+        self.assertIn(PRIMARY_COOKIE_NAME, response.cookies)
+        response = self.client.get('/')
+        self.assertNotIn(PRIMARY_COOKIE_NAME, response.cookies)
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs a second database configured as "replica"')
+@override_settings(BLOG_DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Run with two separate databases, e.g. two SQLite files, so rows written
+    to the primary only are missing on the replica
+    """
+    databases = '__all__'
+
+    def setUp(self) -> None:
+        cache.clear()
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='admin')
+        # bulk_create skips the signal handlers, which write to the primary
+        Post.objects.using('replica').bulk_create([Post(title='replicated', slug='replicated', body='body')])
+
+    def test_read_views_use_replica(self):
+        Post.objects.create(title='fresh', body='body')
+        response = self.client.get('/')
+        self.assertContains(response, 'replicated')
+        self.assertNotContains(response, 'fresh')
+
+    def test_editor_reads_own_writes(self):
+        self.client.login(username='admin', password='admin')
+        self.client.post('/tags/create/', {'title': 'python'})
+        self.assertTrue(Tag.objects.filter(title='python').exists())
+        response = self.client.get('/tags/')
+        self.assertContains(response, 'python')
+        self.client.cookies.pop(PRIMARY_COOKIE_NAME)
+        response = self.client.get('/tags/')
+        self.assertNotContains(response, 'python')
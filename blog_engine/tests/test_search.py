@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from ..models import Post, SearchIndexEntry
+from ..search import SNIPPET_LENGTH, InvertedIndexSearchBackend, make_snippet, tokenize
+
+
+class InvertedIndexSearchBackendTest(TestCase):
+    def setUp(self) -> None:
+        self.backend = InvertedIndexSearchBackend()
+        self.post1 = Post.objects.create(title='Django tips', body='querysets are lazy')
+        self.post2 = Post.objects.create(title='Python', body='django and python querysets')
+        self.post3 = Post.objects.create(title='Cooking', body='pasta recipe')
+
+    def test_tokenize_drops_stop_words(self):
+        self.assertEqual(tokenize('The Django ORM, and the QuerySet'), ['django', 'orm', 'queryset'])
+
+    def test_post_save_updates_index(self):
+        self.assertTrue(SearchIndexEntry.objects.filter(post=self.post3, term='pasta').exists())
+        self.post3.body = 'pizza recipe'
+        self.post3.save()
+        self.assertFalse(SearchIndexEntry.objects.filter(post=self.post3, term='pasta').exists())
+        self.assertTrue(SearchIndexEntry.objects.filter(post=self.post3, term='pizza').exists())
+
+    def test_search_requires_all_terms(self):
+        results = self.backend.search(Post.objects.all(), 'django querysets')
+        self.assertEqual(set(results), {self.post1, self.post2})
+        results = self.backend.search(Post.objects.all(), 'django pasta')
+        self.assertFalse(results.exists())
+
+    def test_search_ranks_title_matches_first(self):
+        results = list(self.backend.search(Post.objects.all(), 'django'))
+        self.assertEqual(results, [self.post1, self.post2])
+
+    def test_make_snippet_escapes_and_marks_terms(self):
+        snippet = make_snippet('use <b>Django</b> daily', {'django'})
+        self.assertEqual(snippet, 'use &lt;b&gt;<mark>Django</mark>&lt;/b&gt; daily')
+
+    def test_index_stores_first_body_offset(self):
+        post = Post.objects.create(title='Offsets', body='*alpha* beta alpha')
+        self.assertEqual(post.body_text, 'alpha beta alpha')
+        self.assertEqual(SearchIndexEntry.objects.get(post=post, term='alpha').offset, 0)
+        self.assertEqual(SearchIndexEntry.objects.get(post=post, term='beta').offset, 6)
+        self.assertIsNone(SearchIndexEntry.objects.get(post=post, term='offsets').offset)
+
+    def test_highlight_extracts_window_around_first_match(self):
+        body = ' '.join('filler%d' % i for i in range(200)) + ' needle ' + ' '.join('tail%d' % i for i in range(200))
+        post = Post.objects.create(title='Long', body=body)
+        [result] = self.backend.highlight([post], 'needle')
+        self.assertIn('<mark>needle</mark>', result.headline)
+        self.assertTrue(result.headline.startswith('&hellip; filler'))
+        self.assertTrue(result.headline.endswith(' &hellip;'))
+        self.assertLess(len(result.headline), SNIPPET_LENGTH + 40)
+
+    def test_highlight_title_only_match_starts_at_beginning(self):
+        [result] = self.backend.highlight([self.post1], 'tips')
+        self.assertEqual(result.headline, 'querysets are lazy')
@@ -0,0 +1,79 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import sitemaps
+from ..models import Post, Tag
+
+NS = {'s': sitemaps.SITEMAP_NS}
+
+
+def parse(response):
+    return ElementTree.fromstring(b''.join(response.streaming_content))
+
+
+class SitemapTest(TestCase):
+    def setUp(self) -> None:
+        Tag.objects.create(title='python')
+        for i in range(5):
+            Post.objects.create(title='post %d' % i)
+
+    def test_small_site_is_a_single_urlset(self):
+        root = parse(self.client.get(reverse('sitemap')))
+        locs = [loc.text for loc in root.findall('s:url/s:loc', NS)]
+        self.assertEqual(len(locs), 8)
+        self.assertIn('http://localhost:8000/post/post-3/', locs)
+        self.assertIn('http://localhost:8000/tag/python/', locs)
+
+    @mock.patch.object(sitemaps, 'SITEMAP_MAX_URLS', 2)
+    @mock.patch.object(sitemaps, 'CHUNK_SIZE', 1)
+    def test_large_site_is_split_into_an_index(self):
+        root = parse(self.client.get(reverse('sitemap')))
+        files = [loc.text for loc in root.findall('s:sitemap/s:loc', NS)]
+        # pages, three post files and one tag file
+        self.assertEqual(len(files), 5)
+        urls = []
+        for url in files:
+            section = parse(self.client.get(url.replace('http://localhost:8000', '')))
+            urls.extend(loc.text for loc in section.findall('s:url/s:loc', NS))
+        self.assertEqual(len(urls), 8)
+        self.assertEqual(len(set(urls)), 8)
+
+    def test_unknown_section(self):
+        response = self.client.get(reverse('sitemap_section', kwargs={'section': 'users', 'start': 1}))
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch.object(sitemaps, 'SITEMAP_MAX_URLS', 3)
+    def test_generate_sitemaps_command(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        call_command('generate_sitemaps', output, stdout=StringIO())
+        names = sorted(os.listdir(output))
+        self.assertEqual(len(names), 5)
+        with gzip.open(os.path.join(output, 'sitemap.xml.gz')) as fp:
+            root = ElementTree.parse(fp).getroot()
+        locs = [loc.text for loc in root.findall('s:sitemap/s:loc', NS)]
+        self.assertEqual(len(locs), 4)
+        for loc in locs:
+            self.assertTrue(loc.startswith('http://localhost:8000/sitemap-'), loc)
+            self.assertIn(loc.rpartition('/')[2], names)
+
+    @mock.patch.object(sitemaps, 'SITEMAP_MAX_URLS', 3)
+    def test_generate_sitemaps_command_path(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        call_command('generate_sitemaps', output, '--path', '/static/sitemaps', stdout=StringIO())
+        with gzip.open(os.path.join(output, 'sitemap.xml.gz')) as fp:
+            root = ElementTree.parse(fp).getroot()
+        for loc in root.findall('s:sitemap/s:loc', NS):
+            prefix, _, name = loc.text.rpartition('/')
+            self.assertEqual(prefix, 'http://localhost:8000/static/sitemaps')
+            self.assertTrue(os.path.exists(os.path.join(output, name)), name)
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from .. import slugs
+from ..bulk import import_posts
+from ..models import Post, Tag
+from ..slugs import allocate_slug, allocate_slugs
+
+
+class SlugAllocationTest(TestCase):
+    def test_same_title_gets_next_suffix(self):
+        posts = [Post.objects.create(title='Same title') for _ in range(3)]
+        self.assertEqual([post.slug for post in posts], ['same-title', 'same-title-2', 'same-title-3'])
+        tags = [Tag.objects.create(title='python') for _ in range(2)]
+        self.assertEqual([tag.slug for tag in tags], ['python', 'python-2'])
+
+    def test_allocate_slug_uses_one_query(self):
+        Post.objects.create(title='hello')
+        Post.objects.create(title='hello', slug='hello-9')
+        Post.objects.create(title='hello', slug='hello-10')
+        Post.objects.create(title='hello', slug='hello-world')
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_slug(Post, 'Hello'), 'hello-11')
+
+    def test_free_base_is_reused(self):
+        Post.objects.create(title='hello', slug='hello-4')
+        self.assertEqual(allocate_slug(Post, 'Hello'), 'hello')
+
+    def test_long_titles_keep_room_for_suffix(self):
+        first = Tag.objects.create(title='x' * 60)
+        second = Tag.objects.create(title='x' * 60)
+        self.assertEqual(second.slug, first.slug + '-2')
+        self.assertLessEqual(len(second.slug), 50)
+
+    def test_concurrent_writer_collision_is_retried(self):
+        Post.objects.create(title='race')
+        # the first allocation loses the race to a slug another writer just took
+        with mock.patch.object(slugs, 'allocate_slug', side_effect=['race', 'race-2']):
+            post = Post.objects.create(title='race')
+        self.assertEqual(post.slug, 'race-2')
+
+    def test_allocate_slugs_for_thousands_of_same_titles(self):
+        import_posts(({'title': 'Weekly notes'} for _ in range(300)), batch_size=100)
+        with self.assertNumQueries(1):
+            allocated = allocate_slugs(Post, ['Weekly notes'] * 2000)
+        self.assertEqual(allocated[0], 'weekly-notes-301')
+        self.assertEqual(len(set(allocated)), 2000)
+        self.assertEqual(Post.objects.filter(slug__startswith='weekly-notes').count(), 300)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Post, Tag
+from ..staticsite import export_site
+
+
+class StaticSiteExportTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.tag = Tag.objects.create(title='python')
+        now = timezone.now()
+        self.posts = []
+        for i in range(6):
+            post = Post.objects.create(title='post %d' % i, body='body %d' % i, date_pub=now - timedelta(days=6 - i))
+            self.posts.append(post)
+        self.posts[0].tags.add(self.tag)
+
+    def read(self, path):
+        with open(os.path.join(self.output, path, 'index.html'), encoding='utf-8') as fp:
+            return fp.read()
+
+    def test_full_export(self):
+        call_command('export_static_site', self.output, workers=1, stdout=StringIO())
+        home = self.read('')
+        self.assertIn('post 5', home)
+        self.assertIn('href="/page/2/"', home)
+        self.assertIn('post 0', self.read('page/2'))
+        self.assertIn('href="/"', self.read('page/2'))
+        self.assertIn('body 3', self.read('post/post-3'))
+        self.assertIn('post 0', self.read('tag/python'))
+        self.assertIn('href="/tag/python/"', self.read('tags'))
+
+    def test_incremental_export_rewrites_affected_pages(self):
+        self.assertEqual(export_site(self.output, workers=1), (10, 0))
+        self.assertEqual(export_site(self.output, workers=1), (0, 0))
+
+        # post 0 is on the second page and the only one tagged python
+        self.posts[0].title = 'renamed'
+        self.posts[0].save()
+        self.assertEqual(export_site(self.output, workers=1), (4, 0))
+        self.assertIn('renamed', self.read('page/2'))
+        self.assertIn('renamed', self.read('tag/python'))
+        self.assertNotIn('renamed', self.read(''))
+
+    def test_incremental_export_removes_unpublished_posts(self):
+        export_site(self.output, workers=1)
+        self.posts[0].status = Post.DRAFT
+        self.posts[0].save()
+        self.assertEqual(export_site(self.output, workers=1), (3, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'post', 'post-0')))
+        self.assertNotIn('post 0', self.read('page/2'))
+        self.assertNotIn('post 0', self.read('tag/python'))
+
+        Post.objects.create(title='newest', body='body')
+        export_site(self.output, workers=1)
+        self.assertIn('newest', self.read(''))
+        # the new post pushed post 2 onto the second page
+        self.assertIn('post 2', self.read('page/2'))
@@ -1,6 +1,12 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 from django.contrib.auth.models import User
 from django.urls import resolve
+from django.utils import timezone
+
+from ..caching import get_page_cache_key, get_tag_cloud, invalidate_tag_cloud
 
 from ..views import *
 
@@ -15,6 +21,20 @@ class PostsListViewTest(TestCase):
         view = resolve('/')
         self.assertEqual(view.func.view_class, PostsList)
 
+    def test_posts_list_search_highlights_matches(self):
+        Post.objects.create(title='django', body='all about querysets')
+        Post.objects.create(title='flask', body='all about blueprints')
+        response = self.client.get(reverse('posts_list'), {'q': 'querysets'})
+        self.assertEqual([post.title for post in response.context['posts']], ['django'])
+        self.assertContains(response, '<mark>querysets</mark>', html=False)
+
+    def test_posts_list_renders_excerpt_without_loading_body(self):
+        Post.objects.create(title='markdown', body='Some *emphasis* here')
+        response = self.client.get(reverse('posts_list'))
+        self.assertContains(response, '<p>Some emphasis here</p>', html=False)
+        [post] = response.context['posts']
+        self.assertTrue({'body', 'body_html', 'body_text'} <= post.get_deferred_fields())
+
 
 class TagsListViewTest(TestCase):
     def setUp(self) -> None:
@@ -271,3 +291,137 @@ class PostUpdateView(TestCase):
         form = response.context.get('form')
         self.assertEqual(response.status_code, 200)
         self.assertTrue(form.errors)
+
+
+class ListViewsQueryBudgetTest(TestCase):
+    """
+    Query count must not grow with the number of posts or tags on a page
+    """
+    def setUp(self) -> None:
+        self.tags = [Tag.objects.create(title='tag %d' % i) for i in range(5)]
+        for i in range(8):
+            post = Post.objects.create(title='post %d' % i, body='common body %d' % i)
+            post.tags.set(self.tags[:3])
+        get_tag_cloud()
+
+    def test_posts_list_query_budget(self):
+        with self.assertNumQueries(4):
+            self.client.get(reverse('posts_list'))
+
+    def test_posts_list_cursor_query_budget(self):
+        # no COUNT(*), the validators only read the updated_at index
+        with self.settings(BLOG_CURSOR_PAGINATION=True), self.assertNumQueries(3):
+            self.client.get(reverse('posts_list'))
+
+    def test_posts_list_not_modified_query_budget(self):
+        url = reverse('posts_list')
+        etag = self.client.get(url)['ETag']
+        cache.delete(get_page_cache_key(RequestFactory().get(url)))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_posts_list_search_query_budget(self):
+        with self.assertNumQueries(5):
+            self.client.get(reverse('posts_list'), {'q': 'common'})
+
+    def test_tag_posts_list_query_budget(self):
+        with self.assertNumQueries(5):
+            self.client.get(reverse('tag_posts_list', kwargs={'slug': self.tags[0].slug}))
+
+    def test_tags_list_query_budget(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('tags_list'))
+
+    def test_post_detail_query_budget(self):
+        post = Post.objects.first()
+        with self.assertNumQueries(2):
+            self.client.get(post.get_absolute_url())
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self) -> None:
+        self.tag = Tag.objects.create(title='python')
+        self.post = Post.objects.create(title='new post', body='post body')
+        self.post.tags.add(self.tag)
+
+    def test_post_detail_not_modified(self):
+        url = self.post.get_absolute_url()
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_post_detail_if_modified_since(self):
+        url = self.post.get_absolute_url()
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_rendering(self):
+        url = self.post.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        cache.delete(get_page_cache_key(RequestFactory().get(url)))
+        with mock.patch.object(PostDetail, 'render_to_response') as render_to_response:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        render_to_response.assert_not_called()
+
+    def test_post_edit_changes_validators(self):
+        url = self.post.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        self.post.body = 'edited'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_views_not_modified(self):
+        for url in (reverse('posts_list'), self.tag.get_absolute_url(), reverse('tags_list')):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_list_views_only_send_etag(self):
+        other = Post.objects.create(title='other post', body='body')
+        other.tags.add(self.tag)
+        for url in (reverse('posts_list'), self.tag.get_absolute_url(), reverse('tags_list')):
+            self.assertFalse(self.client.get(url).has_header('Last-Modified'), url)
+        etag = self.client.get(reverse('posts_list'))['ETag']
+        # without a purge, like a save by a worker whose page cache is not shared
+        Post.objects.filter(pk=self.post.pk).update(status=Post.DRAFT, updated_at=timezone.now())
+        cache.delete(get_page_cache_key(RequestFactory().get(reverse('posts_list'))))
+        response = self.client.get(reverse('posts_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_and_aside_changes_change_detail_etag(self):
+        other = Post.objects.create(title='other post', body='body')
+        other.tags.add(self.tag)
+        url = self.post.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        # without a purge, like a worker whose page cache is not shared
+        Post.objects.filter(pk=other.pk).update(title='renamed post')
+        cache.delete(get_page_cache_key(RequestFactory().get(url)))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'renamed post')
+        etag = response['ETag']
+        Tag.objects.filter(pk=self.tag.pk).update(title='renamed tag')
+        invalidate_tag_cloud()
+        cache.delete(get_page_cache_key(RequestFactory().get(url)))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tag_change_changes_tags_list_etag(self):
+        url = reverse('tags_list')
+        etag = self.client.get(url)['ETag']
+        Tag.objects.filter(pk=self.tag.pk).update(title='renamed')
+        cache.delete(get_page_cache_key(RequestFactory().get(url)))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'renamed')
+
+    def test_new_post_changes_list_etag(self):
+        url = reverse('posts_list')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(title='another', body='body')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
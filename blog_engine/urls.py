@@ -1,16 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if getattr(settings, 'BLOG_ASYNC_VIEWS', False):
+    PostsList, PostDetail = views.AsyncPostsList, views.AsyncPostDetail
+    TagsList, TagPostList = views.AsyncTagsList, views.AsyncTagPostList
+else:
+    PostsList, PostDetail = views.PostsList, views.PostDetail
+    TagsList, TagPostList = views.TagsList, views.TagPostList
+
 urlpatterns = [
-    path('', views.PostsList.as_view(), name='posts_list'),
-    path('tags/', views.TagsList.as_view(), name='tags_list'),
+    path('', PostsList.as_view(), name='posts_list'),
+    path('tags/', TagsList.as_view(), name='tags_list'),
+    path('browse/', views.PostBrowse.as_view(), name='browse'),
+    path('popular/', views.PopularPostsList.as_view(), name='popular_posts'),
     path('tags/create/', views.TagCreate.as_view(), name='tag_create'),
     path('post/create/', views.PostCreate.as_view(), name='post_create'),
     path('post/edit/<slug:slug>/', views.PostUpdate.as_view(), name='post_update'),
     path('post/delete/<slug:slug>/', views.PostDelete.as_view(), name='post_delete'),
+    path('post/history/<slug:slug>/', views.PostHistory.as_view(), name='post_history'),
+    path('post/history/<slug:slug>/<int:number>/', views.PostRevision.as_view(), name='post_revision'),
     path('tag/edit/<slug:slug>/', views.TagUpdate.as_view(), name='tag_update'),
     path('tag/delete/<slug:slug>/', views.TagDelete.as_view(), name='tag_delete'),
-    path('post/<slug:slug>/', views.PostDetail.as_view(), name='post_detail'),
-    path('tag/<slug:slug>/', views.TagPostList.as_view(), name='tag_posts_list'),
+    path('post/<slug:slug>/', PostDetail.as_view(), name='post_detail'),
+    path('tag/<slug:slug>/', TagPostList.as_view(), name='tag_posts_list'),
+    path('feed/<str:fmt>/', views.FeedView.as_view(), name='feed'),
+    path('tag/<slug:slug>/feed/<str:fmt>/', views.FeedView.as_view(), name='tag_feed'),
+    path('sitemap.xml', views.SitemapView.as_view(), name='sitemap'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('attachments/<str:name>', views.MediaFileView.as_view(), name='media_file'),
+    path('sitemap-<str:section>-<int:start>.xml', views.SitemapView.as_view(), name='sitemap_section'),
 ]
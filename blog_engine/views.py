@@ -1,14 +1,103 @@
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.contrib.auth.mixins import LoginRequiredMixin
+import asyncio
+import hashlib
+import inspect
+from calendar import timegm
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-
-from .models import Post, Tag
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import InvalidPage
+from django.http import FileResponse, Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.db import close_old_connections
+from django.db.models import F, Max, Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+
+from .media import CACHE_CONTROL, FILE_NAME_RE, IMAGE_EXTENSIONS, get_variant_path
+from .models import Media, Post, Revision, Tag
 from .forms import PostCreateForm, TagCreateForm
+from .caching import get_page_version, get_tag_cloud
+from .facets import filter_by_tags, get_facets
+from .feeds import CONTENT_TYPES, build_feed, get_feed
+from .metrics import registry
+from .pagination import CursorPage, CursorPaginationMixin, CursorPaginator, InvalidCursor
+from .related import get_related_posts, get_related_posts_by_slug
+from .revisions import diff_lines
+from .search import get_search_backend
+from .sitemaps import SECTIONS, iter_section, iter_sitemap
+
+
+def get_visible_posts(user):
+    """
+    Published posts, staff also see drafts and scheduled posts
+    """
+    return Post.objects.all() if user.is_staff else Post.objects.published()
+
+
+def get_post_list_queryset(user):
+    """
+    Posts with only the columns post cards render and their tags prefetched in one query
+    """
+    return get_visible_posts(user).only('title', 'slug', 'excerpt', 'status', 'date_pub').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('title', 'slug'))
+    )
+
+
+class AsideTagsMixin:
+    """
+    Add the cached aside tag cloud to the context
+    """
+    def get_tag_cloud(self):
+        if getattr(self, 'tag_cloud', None) is None:
+            self.tag_cloud = get_tag_cloud()
+        return self.tag_cloud
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag_cloud'] = self.get_tag_cloud()
+        return context
 
 
-class PostsList(ListView):
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match/If-Modified-Since with 304 before the template is rendered
+    """
+    def get_validators(self):
+        """
+        Return (last_modified, etag parts)
+        """
+        return None, []
+
+    def get(self, request, *args, **kwargs):
+        last_modified, etag_parts = self.get_validators()
+        etag_parts = [get_page_version(request.path), request.user.is_staff, request.GET.urlencode()] + list(etag_parts)
+        etag = quote_etag(hashlib.md5(repr(etag_parts).encode('utf-8')).hexdigest())
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class PostListConditionalGetMixin(ConditionalGetMixin):
+    def get_validators(self):
+        # one lookup on the updated_at index, removals and scheduled posts going live
+        # change the page version instead
+        last_modified = Post.objects.aggregate(last_modified=Max('updated_at'))['last_modified']
+        # no Last-Modified, deleting or unpublishing a post never moves it forward
+        return None, [last_modified, self.get_tag_cloud()]
+
+
+class PostsList(PostListConditionalGetMixin, CursorPaginationMixin, AsideTagsMixin, ListView):
     """
     List of all posts
     """
@@ -18,41 +107,130 @@ class PostsList(ListView):
     ordering = ['-date_pub']
 
     def get_queryset(self):
-        search_query = self.request.GET.get('q', None)
-        queryset = Post.objects.all().order_by('-date_pub')
-        if search_query is not None:
-            queryset = queryset.filter(
-                Q(title__contains=search_query) |
-                Q(body__contains=search_query)
-            )
+        self.search_query = self.request.GET.get('q', None)
+        queryset = get_post_list_queryset(self.request.user).order_by('-date_pub')
+        if self.search_query:
+            queryset = get_search_backend().search(queryset, self.search_query)
         return queryset
 
+    def uses_cursor_pagination(self):
+        # ranked search results are not ordered by (date_pub, id)
+        return not self.search_query and super().uses_cursor_pagination()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.search_query:
+            context['posts'] = get_search_backend().highlight(context['posts'], self.search_query)
+            context['search_query'] = self.search_query
+        # pagination links keep the filters
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+        query.pop(self.cursor_kwarg, None)
+        context['page_query'] = query.urlencode()
+        return context
+
+
+class PostBrowse(PostsList):
+    """
+    Posts with every tag given as ?tag=, optionally searched with ?q=, and the
+    counts of the other tags within the results
+    """
+    template_name = 'blog_engine/browse.html'
+
+    def get_selected_tags(self):
+        if getattr(self, 'selected_tags', None) is None:
+            slugs = set(self.request.GET.getlist('tag'))
+            self.selected_tags = list(Tag.objects.filter(slug__in=slugs).only('title', 'slug').order_by('title'))
+            if len(self.selected_tags) != len(slugs):
+                raise Http404('Unknown tag')
+        return self.selected_tags
+
+    def get_queryset(self):
+        return filter_by_tags(super().get_queryset(), [tag.pk for tag in self.get_selected_tags()])
+
+    def get_browse_url(self, slugs):
+        query = QueryDict(mutable=True)
+        query.setlist('tag', sorted(slugs))
+        if self.search_query:
+            query['q'] = self.search_query
+        return '%s?%s' % (reverse('browse'), query.urlencode())
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['tags'] = Tag.objects.all()
+        selected = self.get_selected_tags()
+        slugs = {tag.slug for tag in selected}
+        for tag in selected:
+            tag.remove_url = self.get_browse_url(slugs - {tag.slug})
+        facets = get_facets(self.get_queryset(), [tag.pk for tag in selected])
+        for facet in facets:
+            facet['url'] = self.get_browse_url(slugs | {facet['slug']})
+        context['selected_tags'] = selected
+        context['facets'] = facets
         return context
 
 
-class PostDetail(DetailView):
+class PopularPostsList(PostsList):
+    """
+    Most read posts, by views decayed over BLOG_POPULARITY_HALF_LIFE
+    """
+    template_name = 'blog_engine/popular_posts_list.html'
+    cursor_pagination = False
+
+    def get_queryset(self):
+        self.search_query = None
+        return get_post_list_queryset(self.request.user).filter(stats__popularity__isnull=False).annotate(
+            views=F('stats__views')
+        ).order_by(F('stats__popularity').desc(), '-pk')
+
+
+class PostDetail(ConditionalGetMixin, AsideTagsMixin, DetailView):
     model = Post
     template_name = 'blog_engine/post_detail.html'
 
+    def get_queryset(self):
+        return get_visible_posts(self.request.user)
+
+    def get_object(self, queryset=None):
+        if getattr(self, 'object', None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
+
+    def get_validators(self):
+        post = self.get_object()
+        # the related links and the aside come from other rows, a change there misses this post's updated_at
+        related = [(related.pk, related.slug, related.title, related.date_pub) for related in self.get_related_posts()]
+        return post.updated_at, [post.pk, post.updated_at, related, self.get_tag_cloud()]
+
+    def get_related_posts(self):
+        if getattr(self, 'related_posts', None) is None:
+            self.related_posts = get_related_posts(self.get_object())
+        return self.related_posts
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['tags'] = Tag.objects.all()
+        context['related_posts'] = self.get_related_posts()
         return context
 
 
-class TagsList(ListView):
+class TagsList(ConditionalGetMixin, ListView):
     """
     List of all tags
     """
-    model = Tag
+    queryset = Tag.objects.popular()
     template_name = 'blog_engine/tags_list.html'
     context_object_name = 'tags'
 
+    def get_queryset(self):
+        # read once, the validators are built from the rows the page shows
+        if getattr(self, 'tags', None) is None:
+            self.tags = list(super().get_queryset())
+        return self.tags
+
+    def get_validators(self):
+        return None, [(tag.pk, tag.slug, tag.title, tag.post_count) for tag in self.get_queryset()]
+
 
-class TagPostList(ListView):
+class TagPostList(PostListConditionalGetMixin, CursorPaginationMixin, AsideTagsMixin, ListView):
     """
     List of posts with specific tag
     """
@@ -62,34 +240,345 @@ class TagPostList(ListView):
     ordering = ['-date_pub']
 
     def get_queryset(self):
-        self.tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
-        return Post.objects.filter(tags=self.tag)
+        if getattr(self, 'tag', None) is None:
+            self.tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
+        return get_post_list_queryset(self.request.user).filter(tags=self.tag).order_by('-date_pub')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tag'] = self.tag
-        context['tags'] = Tag.objects.all()
         return context
 
 
-class PostCreate(LoginRequiredMixin, CreateView):
+class FeedView(View):
+    """
+    Atom, RSS or JSON feed of the latest posts, optionally for one tag
+
+    Documents are assembled from stored feed items and cached as bytes.
+    ?since=<ISO datetime> returns only the posts updated after that time.
+    """
+    def get(self, request, fmt, slug=None):
+        if fmt not in CONTENT_TYPES:
+            raise Http404('Unknown feed format')
+        tag = get_object_or_404(Tag, slug=slug) if slug is not None else None
+        since = request.GET.get('since')
+        if since:
+            # a literal + in the offset arrives as a space
+            since = parse_datetime(since.replace(' ', '+'))
+            if since is None:
+                return HttpResponse('Invalid since parameter', status=400)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            etag, content = build_feed(fmt, tag, since)
+        else:
+            etag, content = get_feed(fmt, tag)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=CONTENT_TYPES[fmt])
+        response['ETag'] = etag
+        return response
+
+
+class SitemapView(View):
+    """
+    Stream sitemap.xml, or one of its section files when the site needs a sitemap index
+    """
+    def get(self, request, section=None, start=None):
+        if section is None:
+            chunks = iter_sitemap()
+        elif section in SECTIONS:
+            chunks = iter_section(section, start)
+        else:
+            raise Http404('Unknown sitemap section')
+        return StreamingHttpResponse(
+            (chunk.encode('utf-8') for chunk in chunks), content_type='application/xml'
+        )
+
+
+class MediaFileView(View):
+    """
+    An uploaded file or a resized variant of an image, by its content hashed name
+
+    Variants are made on their first request and kept in BLOG_MEDIA_VARIANT_ROOT
+    under the same name, so a front end server can serve them from there
+    before falling back to this view.
+    """
+    def get(self, request, name):
+        match = FILE_NAME_RE.fullmatch(name)
+        if match is None:
+            raise Http404('Unknown file')
+        media = Media.objects.filter(
+            content_hash=match.group('hash'), extension=match.group('extension')
+        ).order_by('pk').first()
+        if media is None:
+            raise Http404('Unknown file')
+        etag = quote_etag(name)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            width = match.group('width')
+            if width is None:
+                # anything but an image is downloaded, an uploaded page must not run on this site
+                response = FileResponse(
+                    media.file.open('rb'), content_type=media.content_type,
+                    as_attachment=media.extension not in IMAGE_EXTENSIONS, filename=media.name,
+                )
+            elif int(width) in media.get_variant_widths():
+                response = FileResponse(open(get_variant_path(media, int(width)), 'rb'), content_type=media.content_type)
+            else:
+                raise Http404('Unknown variant')
+        response['ETag'] = etag
+        response['Cache-Control'] = CACHE_CONTROL
+        return response
+
+
+class MetricsView(View):
+    """
+    Request metrics of this process in the Prometheus text format
+
+    Only available to staff users and to INTERNAL_IPS.
+    """
+    def get(self, request):
+        if not request.user.is_staff and request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+            raise PermissionDenied
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _in_worker(function):
+    def run():
+        # worker threads keep their own connections, expire them like request threads do
+        close_old_connections()
+        try:
+            return function()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*functions):
+    """
+    Run blocking callables at the same time in worker threads, each with its own database connection
+    """
+    return await asyncio.gather(*(
+        sync_to_async(_in_worker(function), thread_sensitive=False)() for function in functions
+    ))
+
+
+class AsyncReadMixin:
+    """
+    Async GET for the read-only views, served by blog.asgi with BLOG_ASYNC_VIEWS
+
+    The independent queries from get_concurrent_queries() run concurrently,
+    then the regular view code builds the response from self.preloaded.
+    """
+    preloaded = {}
+
+    def get_concurrent_queries(self):
+        """
+        Return {name: callable} of queries that do not depend on each other
+        """
+        return {}
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Django before 4.1 only awaits views that are marked as coroutines
+        return markcoroutinefunction(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        # only get is async, options and the 405 answer of View stay sync
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    def get_preloaded(self, name, load):
+        if name in self.preloaded:
+            return self.preloaded[name]
+        return load()
+
+    def get_validators(self):
+        return self.get_preloaded('validators', super().get_validators)
+
+    def get_tag_cloud(self):
+        return self.get_preloaded('tag_cloud', super().get_tag_cloud)
+
+    async def get(self, request, *args, **kwargs):
+        self.preloaded = {}
+        # the querysets depend on the user, resolve it once instead of in every worker
+        await sync_to_async(lambda: request.user.is_staff)()
+        queries = self.get_concurrent_queries()
+        self.preloaded = dict(zip(queries, await gather_queries(*queries.values())))
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+
+class AsyncPostListMixin(AsyncReadMixin):
+    """
+    Load the validators, the page rows and the tag cloud of a post list at once
+
+    The page is fetched by offset before the count is known and validated
+    against the count afterwards.
+    """
+    def get_concurrent_queries(self):
+        return {
+            'validators': self.get_validators,
+            'page': self.load_page,
+            'tag_cloud': self.get_tag_cloud,
+        }
+
+    def load_page(self):
+        queryset = self.get_queryset()
+        page_size = self.get_paginate_by(queryset)
+        if self.uses_cursor_pagination():
+            paginator = CursorPaginator(queryset, page_size)
+            try:
+                return paginator, paginator.page(self.request.GET.get(self.cursor_kwarg))
+            except InvalidCursor as e:
+                raise Http404(str(e))
+        number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            number = int(number)
+        except ValueError:
+            # 'last' needs the count, leave it to the regular paginator
+            return None
+        if number < 1 or self.get_paginate_orphans():
+            return None
+        bottom = (number - 1) * page_size
+        return number, list(queryset[bottom:bottom + page_size])
+
+    def paginate_queryset(self, queryset, page_size):
+        loaded = self.preloaded.get('page')
+        if loaded is None:
+            return super().paginate_queryset(queryset, page_size)
+        if isinstance(loaded[1], CursorPage):
+            paginator, page = loaded
+        else:
+            number, rows = loaded
+            paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+            try:
+                number = paginator.validate_number(number)
+            except InvalidPage as e:
+                raise Http404('Invalid page (%s): %s' % (number, e))
+            page = paginator._get_page(rows, number, paginator)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class AsyncPostsList(AsyncPostListMixin, PostsList):
+    pass
+
+
+class AsyncTagPostList(AsyncPostListMixin, TagPostList):
+    def get_queryset(self):
+        # filter by slug so the posts do not wait for the tag lookup
+        return get_post_list_queryset(self.request.user).filter(
+            tags__slug=self.kwargs['slug']
+        ).order_by('-date_pub')
+
+    def get_concurrent_queries(self):
+        queries = super().get_concurrent_queries()
+        queries['tag'] = lambda: get_object_or_404(Tag, slug=self.kwargs['slug'])
+        return queries
+
+    def get_context_data(self, **kwargs):
+        self.tag = self.preloaded['tag']
+        return super().get_context_data(**kwargs)
+
+
+class AsyncPostDetail(AsyncReadMixin, PostDetail):
+    def get_concurrent_queries(self):
+        return {
+            'object': self.get_object,
+            'related_posts': lambda: get_related_posts_by_slug(self.kwargs['slug']),
+            'tag_cloud': self.get_tag_cloud,
+        }
+
+    def get_related_posts(self):
+        return self.get_preloaded('related_posts', super().get_related_posts)
+
+
+class AsyncTagsList(AsyncReadMixin, TagsList):
+    def get_concurrent_queries(self):
+        return {'tags': lambda: list(super(AsyncTagsList, self).get_queryset())}
+
+    def get_queryset(self):
+        return self.get_preloaded('tags', super().get_queryset)
+
+
+class RevisionAuthorMixin:
+    """
+    Credit the revision recorded by the save to the current user
+    """
+    def form_valid(self, form):
+        form.instance._revision_author = self.request.user
+        return super().form_valid(form)
+
+
+class PostFormSuccessMixin:
+    def get_success_url(self):
+        # after an upload the form lists the Markdown showing the new files
+        if self.request.FILES:
+            return reverse('post_update', args=[self.object.slug])
+        return reverse('post_detail', args=[self.object.slug])
+
+
+class PostCreate(LoginRequiredMixin, RevisionAuthorMixin, PostFormSuccessMixin, CreateView):
     model = Post
     form_class = PostCreateForm
     template_name = 'blog_engine/post_create_or_update.html'
     raise_exception = True
 
-    def get_success_url(self):
-        return reverse('post_detail', args=[self.object.slug])
-
 
-class PostUpdate(LoginRequiredMixin, UpdateView):
+class PostUpdate(LoginRequiredMixin, RevisionAuthorMixin, PostFormSuccessMixin, UpdateView):
     model = Post
     form_class = PostCreateForm
     template_name = 'blog_engine/post_create_or_update.html'
     raise_exception = True
 
-    def get_success_url(self):
-        return reverse('post_detail', args=[self.object.slug])
+
+class StaffRequiredMixin(UserPassesTestMixin):
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class PostHistory(StaffRequiredMixin, DetailView):
+    """
+    Revisions of a post, newest first
+    """
+    model = Post
+    template_name = 'blog_engine/post_history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['revisions'] = self.object.revisions.defer('data').select_related('author').order_by('-number')
+        return context
+
+
+class PostRevision(StaffRequiredMixin, DetailView):
+    """
+    One revision of a post and its diff against the previous revision
+    """
+    model = Revision
+    template_name = 'blog_engine/post_revision.html'
+    context_object_name = 'revision'
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(
+            Revision.objects.select_related('post', 'author'),
+            post__slug=self.kwargs['slug'], number=self.kwargs['number'],
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        revision = self.object
+        previous = revision.post.revisions.filter(number=revision.number - 1).first()
+        body = revision.get_body()
+        previous_body = previous.get_body() if previous is not None else ''
+        context['post'] = revision.post
+        context['body'] = body
+        context['previous'] = previous
+        context['diff'] = diff_lines(previous_body, body)
+        return context
 
 
 class PostDelete(LoginRequiredMixin, DeleteView):